@@ -0,0 +1,182 @@
+from datetime import datetime
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from models import db, Venue, Artist, public_columns
+from queries import VENUE_AREA_FIELDS, SHOW_FIELDS, venue_areas, show_stream, entity_stream, decode_cursor
+from search import search_entities, search_shows as search_show_rows
+from suggest import suggestions
+from async_reads import load_detail
+from facets import requested_facets, facet_criteria, facet_counts
+from matchmaking import matchmaker
+from exporter import EXPORT_MODELS, EXPORT_FORMATS, export_fields, export_rows, encode, to_json
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def requested_fields(allowed, default):
+  """Parse ?fields=a,b into a tuple, rejecting names outside `allowed` with a 400."""
+  fields = request.args.get('fields')
+  if not fields:
+    return tuple(default)
+  fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+  unknown = [field for field in fields if field not in allowed]
+  if unknown or not fields:
+    abort(400, description='Unknown fields: ' + ', '.join(unknown))
+  return fields
+
+
+def requested_time(name):
+  value = request.args.get(name)
+  if not value:
+    return None
+  try:
+    return datetime.fromisoformat(value)
+  except ValueError:
+    abort(400, description=f'Invalid {name}: {value}')
+
+
+def requested_page():
+  return request.args.get('page', 1, type=int)
+
+
+def stream(items):
+  """Stream `items` as NDJSON, or as a chunked JSON array with ?format=json.
+
+  Items are serialized one by one as the server-side cursor yields them, so
+  memory stays flat whatever the collection size.
+  """
+  if request.args.get('format') == 'json':
+    def generate():
+      yield '['
+      for index, item in enumerate(items):
+        yield (',' if index else '') + to_json(item)
+      yield ']'
+    mimetype = 'application/json'
+  else:
+    def generate():
+      for item in items:
+        yield to_json(item) + '\n'
+    mimetype = 'application/x-ndjson'
+  return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def detail(kind, model, entity_id):
+  try:
+    past_before = decode_cursor(request.args['past_before']) if request.args.get('past_before') else None
+  except ValueError:
+    abort(400, description='Invalid past_before cursor')
+  data = load_detail(
+    kind, model, entity_id, datetime.now(), past_before,
+    current_app.config['DETAIL_UPCOMING_SHOWS'], current_app.config['DETAIL_PAST_SHOWS'],
+    current_app.config['SIMILAR_PER_ENTITY']
+  )
+  if data is None:
+    abort(404)
+  return Response(to_json(data), mimetype='application/json')
+
+
+def matches(kind, model, entity_id):
+  if db.session.get(model, entity_id) is None:
+    abort(404)
+  limit = request.args.get('limit', matchmaker.limit, type=int)
+  return jsonify(matchmaker.top(kind, entity_id, max(1, min(limit, matchmaker.limit))))
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+def venues():
+  fields = requested_fields(VENUE_AREA_FIELDS, VENUE_AREA_FIELDS)
+  return stream(venue_areas(
+    fields=fields, yield_per=current_app.config['API_STREAM_BATCH'],
+    criteria=facet_criteria(Venue, requested_facets(request.args))
+  ))
+
+@api.route('/venues/search')
+def search_venues():
+  return jsonify(search_entities(
+    Venue, request.args.get('search_term', ''), requested_page(), current_app.config['SEARCH_RESULTS_PER_PAGE']
+  ))
+
+@api.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+  return detail('venue', Venue, venue_id)
+
+@api.route('/venues/<int:venue_id>/matches')
+def venue_matches(venue_id):
+  return matches('venue', Venue, venue_id)
+
+@api.route('/artists')
+def artists():
+  fields = requested_fields(public_columns(Artist), ('id', 'name'))
+  return stream(entity_stream(
+    Artist, fields, current_app.config['API_STREAM_BATCH'],
+    facet_criteria(Artist, requested_facets(request.args))
+  ))
+
+@api.route('/artists/search')
+def search_artists():
+  return jsonify(search_entities(
+    Artist, request.args.get('search_term', ''), requested_page(), current_app.config['SEARCH_RESULTS_PER_PAGE']
+  ))
+
+@api.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+  return detail('artist', Artist, artist_id)
+
+@api.route('/artists/<int:artist_id>/matches')
+def artist_matches(artist_id):
+  return matches('artist', Artist, artist_id)
+
+@api.route('/shows')
+def shows():
+  fields = requested_fields(SHOW_FIELDS, SHOW_FIELDS)
+  return stream(show_stream(
+    fields, requested_time('from'), current_app.config['API_STREAM_BATCH']
+  ))
+
+@api.route('/shows/search')
+def search_shows():
+  results = search_show_rows(
+    request.args.get('search_term', ''), requested_page(), current_app.config['SEARCH_RESULTS_PER_PAGE']
+  )
+  return Response(to_json(results), mimetype='application/json')
+
+@api.route('/facets/<any(venues, artists):entity>')
+def facets(entity):
+  return jsonify(facet_counts(entity[:-1], requested_facets(request.args)))
+
+@api.route('/suggest')
+def suggest():
+  limit = min(request.args.get('limit', current_app.config['SUGGEST_LIMIT'], type=int), 50)
+  return jsonify(suggestions.suggest(request.args.get('q', ''), max(limit, 1)))
+
+@api.route('/suggest/stats')
+def suggest_stats():
+  return jsonify(suggestions.stats())
+
+@api.route('/export/<entity>')
+def export(entity):
+  if entity not in EXPORT_MODELS:
+    abort(404)
+  fmt = request.args.get('format', 'ndjson')
+  if fmt not in EXPORT_FORMATS:
+    abort(400, description=f'Unknown format: {fmt}')
+  joined = request.args.get('joined') in ('1', 'true')
+  batch = current_app.config['API_STREAM_BATCH']
+
+  fields = export_fields(entity, joined)
+  rows = export_rows(entity, requested_time('since'), joined, batch)
+  mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+  return Response(stream_with_context(encode(rows, fields, fmt, batch)), mimetype=mimetype)
+
+@api.errorhandler(400)
+def bad_request(error):
+  return jsonify({"error": error.description}), 400
+
+@api.errorhandler(404)
+def not_found(error):
+  return jsonify({"error": "Not found"}), 404
@@ -2,47 +2,101 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func
+from sqlalchemy.exc import DBAPIError
+import os
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
 from models import *
+from cache import cache, venue_key, artist_key, show_list_key
+from conditional import conditional
+from streaming import stream_page
+from suggest import suggestions
+from async_reads import async_reads, load_detail
+from pool_metrics import pool_metrics
+from routing import router
+from instrumentation import instrumentation
+from metrics import metrics
+from formatting import format_datetime, format_datetimes
+from facets import requested_facets, facet_criteria, facet_counts
+from api import api
+from importer import import_command
+from exporter import export_command
+from counters import counter_rollover, counters_command
+from matchmaking import matchmaker, matches_command
+from recommendations import recommendations, recommendations_command
+from search import search_entities, search_shows as search_show_rows
+from queries import entity_version, table_version, show_list_version, venue_areas, entity_stream, show_page, encode_cursor, decode_cursor, touch_referrers, SHOWN_ON_NEIGHBOURS
 from werkzeug.exceptions import abort
 from datetime import datetime
+from itertools import chain
 from sqlalchemy.orm import relationship
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
 app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
-migrate = Migrate(app,db)
+moment = Moment()
+migrate = Migrate()
+
+def create_app(settings=None):
+  """Configure the application and its extensions, and return it.
+
+  Settings come from config.py (driven by the environment), updated with
+  `settings`. The views below are registered on this module's `app`, so a
+  process holds one application; wsgi.py is the production entry point.
+  """
+  app.config.from_object('config')
+  if settings:
+    app.config.update(settings)
+  moment.init_app(app)
+  pool_metrics.init_app(app)
+  router.init_app(app, db)
+  db.init_app(app)
+  with app.app_context():
+    pool_metrics.watch(db.engines)
+  migrate.init_app(app, db)
+  cache.init_app(app)
+  suggestions.init_app(app)
+  async_reads.init_app(app)
+  instrumentation.init_app(app)
+  metrics.init_app(app)
+  matchmaker.init_app(app)
+  recommendations.init_app(app)
+  counter_rollover.init_app(app)
+  app.register_blueprint(api)
+  app.cli.add_command(import_command)
+  app.cli.add_command(export_command)
+  app.cli.add_command(counters_command)
+  app.cli.add_command(matches_command)
+  app.cli.add_command(recommendations_command)
+
+  if not app.debug and not app.testing and app.config.get('ERROR_LOG'):
+    path = os.path.abspath(app.config['ERROR_LOG'])
+    # create_app() may run more than once per process; the logger is process-wide
+    if not any(getattr(handler, 'baseFilename', None) == path for handler in app.logger.handlers):
+      file_handler = FileHandler(path)
+      file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+      )
+      file_handler.setLevel(logging.INFO)
+      app.logger.addHandler(file_handler)
+    app.logger.setLevel(logging.INFO)
+    app.logger.info('errors')
+  return app
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  if isinstance(value, str):
-    date = dateutil.parser.parse(value)
-  else:
-    date = value
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
 app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.filters['datetimes'] = format_datetimes
 
 #----------------------------------------------------------------------------#
 # Controllers.
@@ -57,81 +111,46 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@conditional(lambda: table_version(Venue, datetime.now()))
 def venues():
-  locations = Venue.query.with_entities(func.count(Venue.id), Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-  data = []
-
-  for location in locations:
-    venue_in_location = Venue.query.filter_by(state=location.state, city=location.city).all()
-    venues = []
-    
-    for venue in venue_in_location:
-      upcoming_shows = Show.query.filter(Show.venue_id == venue.id, Show.start_time > datetime.now()).all()
-      venues.append({
-        "id": venue.id,
-        "name": venue.name, 
-        "num_upcoming_shows": len(upcoming_shows)
-      })
-
-    data.append({
-      "city": location.city,
-      "state": location.state, 
-      "venues": venues
-    })
-
-  return render_template('pages/venues.html', areas=data);
+  filters = requested_facets(request.args)
+  facets = facet_counts('venue', filters)
+  # Listings are not cached: rows stream from a server-side cursor as the page
+  # renders, so memory stays flat however large the catalogue grows (repeat
+  # visits are answered by the ETag)
+  data = venue_areas(criteria=facet_criteria(Venue, filters), yield_per=app.config['LISTING_YIELD_PER'])
+  return stream_page('pages/venues.html', areas=data, facets=facets, filters=filters)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
   search_term = request.form.get('search_term', '')
-  res= Venue.query.filter(Venue.name.ilike('%'+search_term+'%')).all()
-  resCount= len(res)
-  response={
-    "count" : resCount,
-    "data" : []
-  }
-  if not res: 
+  page = request.form.get('page', 1, type=int)
+  response = search_entities(Venue, search_term, page, app.config['SEARCH_RESULTS_PER_PAGE'])
+  if not response['count']:
     flash('Sorry try some different keywords') 
 
-  for venue in res:
-    num_upcoming_shows = db.session.query(func.count(Show.id)).filter(
-      Show.venue_id == venue.id, Show.start_time > datetime.now()).scalar()
-    response['data'].append({
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": num_upcoming_shows,
-    })
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@conditional(lambda venue_id: entity_version('venue', venue_id, datetime.now()))
 def show_venue(venue_id):
-  selected_venue = Venue.query.get_or_404(venue_id)
-  # Get the shows for the selected venue and join with the Artist table
-  shows = db.session.query(Show, Artist.name, Artist.image_link)\
-    .join(Artist).filter(Show.venue_id == selected_venue.id)
-  
-  past_shows = []
-  upcoming_shows = []
-
-  for show, artist_name, artist_image_link in shows:
-    temp_show = {
-      'artist_id': show.artist_id,
-      'artist_name': artist_name,
-      'artist_image_link': artist_image_link,
-      'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-    }
-    if show.start_time <= datetime.now():
-      past_shows.append(temp_show)
-    else:
-      upcoming_shows.append(temp_show)
-
-  # object class to dict
-  data = vars(selected_venue)
-
-  data['past_shows'] = past_shows
-  data['upcoming_shows'] = upcoming_shows
-  data['past_shows_count'] = len(past_shows)
-  data['upcoming_shows_count'] = len(upcoming_shows)
+  now = datetime.now()
+  try:
+    past_before = decode_cursor(request.args['past_before']) if request.args.get('past_before') else None
+  except ValueError:
+    abort(400)
+
+  def build():
+    data = load_detail(
+      'venue', Venue, venue_id, now, past_before,
+      app.config['DETAIL_UPCOMING_SHOWS'], app.config['DETAIL_PAST_SHOWS'], app.config['SIMILAR_PER_ENTITY']
+    )
+    if data is None:
+      abort(404)
+    return data
+
+  # Only the default page is cached; older past-show pages are built on demand
+  data = build() if past_before else cache.get_or_build(venue_key(venue_id), build)
 
   return render_template('pages/show_venue.html', venue=data)
 
@@ -167,6 +186,8 @@ def create_venue_submission():
 
       db.session.add(venue)
       db.session.commit()
+      suggestions.add('venue', venue.id, venue.name)
+      matchmaker.changed('venue', venue.id)
     except ValueError as e:
       print(e)
       # If there is any error, roll back it
@@ -191,8 +212,21 @@ def delete_venue(venue_id):
   error = False
   try:
     venue = Venue.query.get(venue_id)
-    db.session.delete(venue)
-    db.session.commit()
+    # Artists who played here lose these shows from their pages
+    artist_ids = {show.artist_id for show in venue.shows}
+
+    def write():
+      # the shows go (cascade) before the artists' rows are touched, the lock
+      # order of the counter rollover
+      db.session.delete(venue)
+      db.session.flush()
+      Artist.query.filter(Artist.id.in_(artist_ids)).update(
+        {Artist.updated_at: datetime.now()}, synchronize_session=False
+      )
+
+    commit_with_retry(write)
+    cache.invalidate(venues=[venue_id], artists=artist_ids, show_list=True)
+    suggestions.remove('venue', venue_id)
   except:
     db.session.rollback()
     error = True
@@ -207,90 +241,104 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@conditional(lambda: table_version(Artist, datetime.now()))
 def artists():
-  data = []
-  artistLists = Artist.query.all()
-
-  if not artistLists: 
-    flash('no artists exists') 
-  for artist in artistLists:
-    data.append({
-      "id": artist.id,
-      "name": artist.name,
-    })
+  filters = requested_facets(request.args)
+  facets = facet_counts('artist', filters)
+  # Listings are not cached: rows stream from a server-side cursor as the page
+  # renders, so memory stays flat however large the catalogue grows (repeat
+  # visits are answered by the ETag)
+  data = entity_stream(Artist, ('id', 'name'), app.config['LISTING_YIELD_PER'], facet_criteria(Artist, filters))
+  # the flash has to be in before the layout goes out
+  first = next(data, None)
+  if first is None:
+    flash('no artists exists')
+  else:
+    data = chain([first], data)
 
-  return render_template('pages/artists.html', artists=data)
+  return stream_page('pages/artists.html', artists=data, facets=facets, filters=filters)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
   search_term = request.form.get('search_term', '')
-  res= Artist.query.filter(Artist.name.ilike('%'+search_term+'%')).all()
-  resCount= len(res)
-  response={
-    "count" : resCount,
-    "data" : []
-  }
-
-  if not res:
+  page = request.form.get('page', 1, type=int)
+  response = search_entities(Artist, search_term, page, app.config['SEARCH_RESULTS_PER_PAGE'])
+  if not response['count']:
     flash('Sorry try some different keywords') 
-  
-  for item in res:
-    upcoming_shows = db.session.query(Show).join(Artist).filter(Show.artist_id == item.id).filter(Show.start_time > datetime.now()).all()
-    num_upcoming_shows = len(upcoming_shows)
-    response['data'].append({
-      "id": item.id,
-      "name": item.name,
-      "num_upcoming_shows": num_upcoming_shows,
-    })
+
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
+@conditional(lambda artist_id: entity_version('artist', artist_id, datetime.now()))
 def show_artist(artist_id):
-  selected_artist = Artist.query.get_or_404(artist_id)
-
-  shows = db.session.query(Show, Venue.name, Venue.image_link)\
-    .join(Venue).filter(Show.artist_id == artist_id)
-  
-  past_shows = []
-  upcoming_shows = []
-
-  for show, venue_name, venue_image_link in shows:
-    temp_show = {
-      "venue_id": show.venue_id,
-      "venue_name": venue_name,
-      "venue_image_link": venue_image_link,
-      'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-    }
-    if show.start_time <= datetime.now():
-      past_shows.append(temp_show)
-    else:
-      upcoming_shows.append(temp_show)
-
-  # object class to dict
-  data = vars(selected_artist)
-  data['past_shows'] = past_shows
-  data['upcoming_shows'] = upcoming_shows
-  data['past_shows_count'] = len(past_shows)
-  data['upcoming_shows_count'] = len(upcoming_shows)
+  now = datetime.now()
+  try:
+    past_before = decode_cursor(request.args['past_before']) if request.args.get('past_before') else None
+  except ValueError:
+    abort(400)
+
+  def build():
+    data = load_detail(
+      'artist', Artist, artist_id, now, past_before,
+      app.config['DETAIL_UPCOMING_SHOWS'], app.config['DETAIL_PAST_SHOWS'], app.config['SIMILAR_PER_ENTITY']
+    )
+    if data is None:
+      abort(404)
+    return data
+
+  # Only the default page is cached; older past-show pages are built on demand
+  data = build() if past_before else cache.get_or_build(artist_key(artist_id), build)
 
   return render_template('pages/show_artist.html', artist=data)
 
+#  Matches
+#  ----------------------------------------------------------------
+
+@app.route('/venues/<int:venue_id>/matches')
+def venue_matches(venue_id):
+  venue = Venue.query.options(*load_profile(Venue, 'detail')).get_or_404(venue_id)
+  return render_template('pages/matches.html', kind='venue', entity=venue, matches=matchmaker.top('venue', venue_id))
+
+@app.route('/artists/<int:artist_id>/matches')
+def artist_matches(artist_id):
+  artist = Artist.query.options(*load_profile(Artist, 'detail')).get_or_404(artist_id)
+  return render_template('pages/matches.html', kind='artist', entity=artist, matches=matchmaker.top('artist', artist_id))
+
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.options(*load_profile(Artist, 'edit')).get(artist_id)
   form = ArtistForm(obj=artist)
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  form = ArtistForm(request.form)
+  form = ArtistForm(request.form, meta={'csrf': False})
+  # unknown genres would fail in the bitmask encoder, so the form is checked first
+  if not form.validate():
+    message = []
+    for field, errors in form.errors.items():
+      for error in errors:
+        message.append(f"{field}: {error}")
+    flash('Please fix the following errors: ' + ', '.join(message))
+    return redirect(url_for('edit_artist', artist_id=artist_id))
   error = False
   try:
-    artist = Artist.query.get(artist_id)
-    artist = form.populate_obj(artist)
-    db.session.commit()
+    artist = Artist.query.options(*load_profile(Artist, 'edit')).get(artist_id)
+    shown = {column: getattr(artist, column) for column in SHOWN_ON_NEIGHBOURS}
+
+    def write():
+      form.populate_obj(artist)
+      db.session.flush()
+      # The artist's name and image also appear on the pages of the venues they
+      # played and of the artists listing them as similar
+      return touch_referrers('artist', artist_id, [column for column, value in shown.items() if getattr(artist, column) != value])
+
+    venue_ids, neighbour_ids = commit_with_retry(write)
+    cache.invalidate(venues=venue_ids, artists=[artist_id, *neighbour_ids], show_list=True)
+    suggestions.add('artist', artist_id, artist.name)
+    matchmaker.changed('artist', artist_id)
   except:
     db.session.rollback()
     error = True
@@ -304,18 +352,37 @@ def edit_artist_submission(artist_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.options(*load_profile(Venue, 'edit')).get(venue_id)
   form = VenueForm(obj=venue)
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  form = VenueForm(request.form)
+  form = VenueForm(request.form, meta={'csrf': False})
+  # unknown genres would fail in the bitmask encoder, so the form is checked first
+  if not form.validate():
+    message = []
+    for field, errors in form.errors.items():
+      for error in errors:
+        message.append(f"{field}: {error}")
+    flash('Please fix the following errors: ' + ', '.join(message))
+    return redirect(url_for('edit_venue', venue_id=venue_id))
   error = False
   try:
-    venue = Venue.query.get(venue_id)
-    venue = form.populate_obj(venue)
-    db.session.commit()
+    venue = Venue.query.options(*load_profile(Venue, 'edit')).get(venue_id)
+    shown = {column: getattr(venue, column) for column in SHOWN_ON_NEIGHBOURS}
+
+    def write():
+      form.populate_obj(venue)
+      db.session.flush()
+      # The venue's name and image also appear on the pages of the artists who
+      # played there and of the venues listing it as similar
+      return touch_referrers('venue', venue_id, [column for column, value in shown.items() if getattr(venue, column) != value])
+
+    artist_ids, neighbour_ids = commit_with_retry(write)
+    cache.invalidate(venues=[venue_id, *neighbour_ids], artists=artist_ids, show_list=True)
+    suggestions.add('venue', venue_id, venue.name)
+    matchmaker.changed('venue', venue_id)
   except:
     db.session.rollback()
     error = True
@@ -354,6 +421,8 @@ def create_artist_submission():
         )
       db.session.add(artist)
       db.session.commit()
+      suggestions.add('artist', artist.id, artist.name)
+      matchmaker.changed('artist', artist.id)
     except ValueError as e:
       print(e)
       # If there is any error, roll back it
@@ -377,24 +446,42 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@conditional(show_list_version)
 def shows():
-  data = []
+  # Optional time window (?from=) and keyset cursor (?after=) from the previous page
+  window = {}
+  start = after = None
+  try:
+    if request.args.get('from'):
+      window['from'] = request.args['from']
+      start = datetime.fromisoformat(window['from'])
+    if request.args.get('after'):
+      after = decode_cursor(request.args['after'])
+  except ValueError:
+    abort(400)
+
+  def build():
+    data = []
+    rows, next_cursor = show_page(start, after, app.config['SHOWS_PER_PAGE'])
+    for row in rows:
+      data.append({
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+      })
+    return data, next_cursor
 
-  shows = Show.query.all()
-  if not shows: 
+  data, next_cursor = cache.get_or_build(show_list_key(window.get('from'), request.args.get('after')), build)
+  if not data and not after:
     flash('no shows exists')
-  for show in shows:
-    find_artist = Artist.query.filter(Artist.id==show.artist_id).first()
-    find_venue = Venue.query.filter(Venue.id==show.venue_id).first()
-    data.append({
-      "venue_id": find_venue.id,
-      "venue_name": find_venue.name,
-      "artist_id": find_artist.id,
-      "artist_name": find_artist.name,
-      "artist_image_link": find_artist.image_link,
-      "start_time": format_datetime(show.start_time, format='medium')
-    })
-  return render_template('pages/shows.html', shows=data)
+
+  next_url = None
+  if next_cursor:
+    next_url = url_for('shows', after=encode_cursor(next_cursor), **window)
+  return stream_page('pages/shows.html', shows=data, next_url=next_url)
 
 @app.route('/shows/create')
 def create_shows():
@@ -416,17 +503,31 @@ def create_show_submission():
       if not venue:
         flash('Venue not found')
         return render_template('forms/new_show.html', form=form)
-      
-      show = Show(
-          artist_id=form.artist_id.data,
-          venue_id=form.venue_id.data,
-          start_time=form.start_time.data
-      )
-      db.session.add(show)
-      db.session.commit()
+
+      def write():
+        # the show goes in before the venue and artist rows are touched, the
+        # lock order of the counter rollover
+        db.session.add(Show(
+            artist_id=form.artist_id.data,
+            venue_id=form.venue_id.data,
+            start_time=form.start_time.data
+        ))
+        db.session.flush()
+        # a new show changes both the venue's and the artist's pages
+        venue.updated_at = artist.updated_at = datetime.now()
+
+      commit_with_retry(write)
+      cache.invalidate(venues=[form.venue_id.data], artists=[form.artist_id.data], show_list=True)
+      # playing together raises the pair's match score
+      matchmaker.changed('venue', venue.id)
     except ValueError as e:
       print('e',e)
       db.session.rollback()
+    except DBAPIError:
+      db.session.rollback()
+      app.logger.exception('show not listed')
+      flash('The show could not be listed, please try again.')
+      return render_template('forms/new_show.html', form=form)
     finally:
       db.session.close()
 
@@ -446,40 +547,40 @@ def create_show_submission():
 @app.route('/shows/search', methods=['POST'])
 def search_shows():
   search_term = request.form.get('search_term', '')
-  shows = db.session.query(
-    Venue.name,
-    Artist.name,
-    Artist.image_link,
-    Show.start_time,
-    Show.artist_id,
-    Show.venue_id
-  ).join(
-    Show, Venue.id == Show.venue_id
-  ).join(
-    Artist, Artist.id == Show.artist_id
-  ).filter(
-    Artist.name.ilike('%'+search_term+'%') | Venue.name.ilike('%'+search_term+'%')
-  ).all()
-
-  results = []
-  for venue_name, artist_name, artist_image_link, start_time, artist_id, venue_id in shows:
-    results.append({
-      "artist_id": artist_id,
-      "artist_name": artist_name,
-      "artist_image_link": artist_image_link,
-      "venue_id": venue_id,
-      "venue_name": venue_name,
-      "start_time": format_datetime(start_time, format='medium')
-    })
-
-  response = {
-    "count": len(results),
-    "data": results
-  }
- 
+  page = request.form.get('page', 1, type=int)
+  response = search_show_rows(search_term, page, app.config['SEARCH_RESULTS_PER_PAGE'])
+
   return render_template('pages/show.html', results=response, search_term=request.form.get('search_term', ''))
 
 
+#  Cache
+#  ----------------------------------------------------------------
+
+@app.route('/cache/stats')
+def cache_stats():
+  return jsonify(cache.stats())
+
+#  Request profiles
+#  ----------------------------------------------------------------
+
+@app.route('/requests/stats')
+def request_stats():
+  return jsonify(instrumentation.stats())
+
+#  Connection pool
+#  ----------------------------------------------------------------
+
+@app.route('/pool/stats')
+def pool_stats():
+  return jsonify({"pools": pool_metrics.stats(), "routing": router.stats()})
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def prometheus_metrics():
+  return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found_error(error):
   return render_template('errors/404.html'), 404
@@ -488,27 +589,18 @@ def not_found_error(error):
 def server_error(error):
   return render_template('errors/500.html'), 500
 
-if not app.debug:
-  file_handler = FileHandler('error.log')
-  file_handler.setFormatter(
-    Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-  )
-  app.logger.setLevel(logging.INFO)
-  file_handler.setLevel(logging.INFO)
-  app.logger.addHandler(file_handler)
-  app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
+# Development server; production runs wsgi.py under gunicorn or uWSGI.
 # Default port:
 if __name__ == '__main__':
-  app.run()
+  create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
   port = int(os.environ.get('PORT', 5000))
-  app.run(host='0.0.0.0', port=port)
+  create_app().run(host='0.0.0.0', port=port)
 '''
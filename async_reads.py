@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from sqlalchemy.engine import make_url
+from models import load_profile
+from pool_metrics import pool_metrics, MeteredQueuePool, MeteredAsyncAdaptedQueuePool
+from routing import replica_bind
+from queries import entity_shows_statement, entity_shows_window, similar_statement, detail_payload, entity_detail
+
+#----------------------------------------------------------------------------#
+# Async reads.
+#----------------------------------------------------------------------------#
+
+class AsyncReads:
+  """Runs the independent queries of a read page concurrently on asyncpg.
+
+  The views stay synchronous (Flask serves them over WSGI); with ASYNC_READS
+  on they hand a coroutine to one long-lived event loop thread and wait for
+  it, so a page costs its slowest query instead of the sum of them. Keeping
+  a single loop lets the asyncpg connection pools live across requests.
+
+  There is one async engine per database bind, built from the same
+  SQLALCHEMY_ENGINE_OPTIONS as the synchronous ones, and a replica-routed
+  request reads from its replica's. The coroutines run in the request's
+  context, so the queries count in its profile (instrumentation) and the
+  pools show up in /pool/stats as 'async' and 'async_<bind>'.
+  """
+
+  def __init__(self):
+    self.engines = {}
+    self.sessions = None
+    self.loop = None
+
+  @property
+  def enabled(self):
+    return bool(self.engines)
+
+  def init_app(self, app):
+    app.extensions['async_reads'] = self
+    if not app.config.get('ASYNC_READS', False):
+      return
+    # optional dependency (with asyncpg), only needed for the async read path
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    options = async_engine_options(app.config)
+    urls = {None: app.config['SQLALCHEMY_DATABASE_URI']}
+    # the replica binds registered by routing.router
+    urls.update({bind: app.config['SQLALCHEMY_BINDS'][bind]['url'] for bind in app.extensions['replica_router'].replicas})
+    self.engines = {
+      bind: create_async_engine(make_url(url).set(drivername='postgresql+asyncpg'), **options)
+      for bind, url in urls.items()
+    }
+    pool_metrics.watch({
+      'async' if bind is None else f'async_{bind}': engine.sync_engine for bind, engine in self.engines.items()
+    })
+    self.sessions = async_sessionmaker(expire_on_commit=False)
+    self.loop = asyncio.new_event_loop()
+    threading.Thread(target=self.loop.run_forever, name='async-reads', daemon=True).start()
+
+  def run(self, coroutine):
+    """Run `coroutine` on the loop thread and return its result.
+
+    The task starts from a copy of the caller's context, so `g` and the
+    request profile are those of the calling request.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+  def session(self):
+    """AsyncSession on the engine of the database the current request reads from."""
+    return self.sessions(bind=self.engines[replica_bind()])
+
+  async def get(self, model, entity_id, options=()):
+    async with self.session() as session:
+      return await session.get(model, entity_id, options=options)
+
+  async def rows(self, statement):
+    async with self.session() as session:
+      return (await session.execute(statement)).all()
+
+  async def entity_detail(self, kind, model, entity_id, now, past_before, upcoming_limit, past_limit, similar_limit):
+    """queries.entity_detail with the entity, both show windows and its neighbours fetched at once, each on its own connection."""
+    entity, upcoming_rows, past_rows, similar_rows = await asyncio.gather(
+      self.get(model, entity_id, load_profile(model, 'detail')),
+      self.rows(entity_shows_statement(kind, entity_id, now, True, limit=upcoming_limit)),
+      self.rows(entity_shows_statement(kind, entity_id, now, False, before=past_before, limit=past_limit)),
+      self.rows(similar_statement(kind, entity_id, similar_limit))
+    )
+    if entity is None:
+      return None
+    return detail_payload(
+      entity,
+      entity_shows_window(kind, upcoming_rows, upcoming_limit),
+      entity_shows_window(kind, past_rows, past_limit),
+      [dict(row._mapping) for row in similar_rows]
+    )
+
+
+async_reads = AsyncReads()
+
+
+def async_engine_options(config):
+  """SQLALCHEMY_ENGINE_OPTIONS for asyncpg: the same pool settings, and the statement timeout as a server setting."""
+  options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+  # psycopg2's connect_args (the -c statement_timeout option) mean nothing to asyncpg
+  options.pop('connect_args', None)
+  if options.get('poolclass') is MeteredQueuePool:
+    options['poolclass'] = MeteredAsyncAdaptedQueuePool
+  options['pool_size'] = config.get('ASYNC_READS_POOL_SIZE', options.get('pool_size', 10))
+  if config.get('DB_STATEMENT_TIMEOUT_MS'):
+    options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+  return options
+
+
+def load_detail(kind, model, entity_id, now, past_before=None, upcoming_limit=30, past_limit=12, similar_limit=6):
+  """Detail payload of a venue or artist, or None if it does not exist; concurrent when ASYNC_READS is on."""
+  if async_reads.enabled:
+    return async_reads.run(async_reads.entity_detail(
+      kind, model, entity_id, now, past_before, upcoming_limit, past_limit, similar_limit
+    ))
+  entity = model.query.options(*load_profile(model, 'detail')).get(entity_id)
+  return None if entity is None else entity_detail(kind, entity, now, past_before, upcoming_limit, past_limit, similar_limit)
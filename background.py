@@ -0,0 +1,33 @@
+import threading
+
+#----------------------------------------------------------------------------#
+# Background threads.
+#----------------------------------------------------------------------------#
+# The suggest index, match refreshes and neighbour rebuilds run in daemon
+# threads of the serving processes. flask CLI commands (db upgrade, import,
+# the rebuild commands) build the app too, so create_app() never starts the
+# threads: they start with the first request a process serves.
+
+_lock = threading.Lock()
+
+
+def run_in_background(app, name, target):
+  """Run `target` in a daemon thread named `name` once `app` serves its first request.
+
+  Registering the same name again (create_app() run twice) replaces it.
+  """
+  threads = app.extensions.get('background_threads')
+  if threads is None:
+    threads = app.extensions['background_threads'] = {}
+
+    @app.before_request
+    def start_background_threads():
+      if not threads:
+        return
+      with _lock:
+        pending = list(threads.items())
+        threads.clear()
+      for thread_name, thread_target in pending:
+        threading.Thread(target=thread_target, name=thread_name, daemon=True).start()
+
+  threads[name] = target
@@ -0,0 +1,128 @@
+import os
+import random
+import statistics
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from enums import Genre
+from models import db, Venue, Artist, Show
+from bulk import copy_rows
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+# Standalone scripts, run from the repository root as `python -m
+# benchmarks.<name> --help`; pytest does not collect them. Those reading the
+# database need DATABASE_URL and commit made-up rows to it while they run,
+# so point it at a scratch PostgreSQL database migrated to head.
+
+# What the tests turn off too: background jobs and the view cache
+SETTINGS = {
+  'TESTING': True,
+  'CACHE_BACKEND': 'null',
+  'SUGGEST_INDEX': False,
+  'MATCH_REFRESH': False,
+  'SIMILAR_REBUILD': False,
+  'COUNTERS_ROLLOVER_SECONDS': 0,
+}
+
+
+def benchmark_app(**settings):
+  """The application over DATABASE_URL, set up like the tests; exits when DATABASE_URL is unset."""
+  if not os.environ.get('DATABASE_URL'):
+    sys.exit('DATABASE_URL is not set: point it at a scratch PostgreSQL database migrated to head')
+  from app import create_app
+  return create_app(dict(SETTINGS, **settings))
+
+
+def percentiles(samples, *points):
+  """The `points` (e.g. 50, 99) percentiles of `samples`."""
+  cuts = statistics.quantiles(samples, n=100, method='inclusive')
+  return [cuts[point - 1] for point in points]
+
+#----------------------------------------------------------------------------#
+# Synthetic catalogue.
+#----------------------------------------------------------------------------#
+
+# Synthetic venues and artists carry this website, so the cleanup leaves real rows alone
+MARKER = 'https://benchmark.invalid'
+
+WORDS = ('Blue', 'Golden', 'Velvet', 'Electric', 'Midnight', 'Crystal', 'Wild', 'Lucky', 'Northern', 'Silver')
+NOUNS = ('Room', 'Hall', 'Garden', 'Tavern', 'Lounge', 'Cellar', 'Collective', 'Quartet', 'Echo', 'Orchestra')
+AREAS = (
+  ('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+  ('Chicago', 'IL'), ('Seattle', 'WA'), ('Nashville', 'TN'),
+)
+
+
+def reserve_ids(model, count):
+  """Take `count` ids from the model's sequence, so rows referencing them can be written before a round trip."""
+  sequence = func.pg_get_serial_sequence(model.__tablename__, 'id')
+  return db.session.execute(select(func.nextval(sequence)).select_from(func.generate_series(1, count))).scalars().all()
+
+
+def entity_row(model, entity_id, rng):
+  city, state = rng.choice(AREAS)
+  row = {
+    'id': entity_id,
+    'name': f'{rng.choice(WORDS)} {rng.choice(NOUNS)} {entity_id}',
+    'city': city,
+    'state': state,
+    'phone': '123-456-7890',
+    'genres': [genre.name for genre in rng.sample(list(Genre), rng.randint(1, 3))],
+    'image_link': '',
+    'facebook_link': '',
+    'website': MARKER,
+    'seeking_description': '',
+  }
+  if model is Venue:
+    row.update(address=f'{entity_id} Main Street', seeking_talent=False)
+  else:
+    row.update(seeking_venue=False)
+  return row
+
+
+def copy_in_chunks(model, rows, chunk_size):
+  chunk = []
+  for row in rows:
+    chunk.append(row)
+    if len(chunk) == chunk_size:
+      copy_rows(model, chunk)
+      db.session.commit()
+      chunk = []
+  if chunk:
+    copy_rows(model, chunk)
+    db.session.commit()
+
+
+@contextmanager
+def synthetic_catalogue(venues, artists, shows, seed=0, chunk_size=10000):
+  """Commit made-up venues, artists and shows (starting within a year either way of now), and delete them on exit.
+
+  Yields the (venue ids, artist ids). Must run in an app context.
+  """
+  rng = random.Random(seed)
+  venue_ids = reserve_ids(Venue, venues)
+  artist_ids = reserve_ids(Artist, artists)
+  now = datetime.now()
+  try:
+    copy_in_chunks(Venue, (entity_row(Venue, venue_id, rng) for venue_id in venue_ids), chunk_size)
+    copy_in_chunks(Artist, (entity_row(Artist, artist_id, rng) for artist_id in artist_ids), chunk_size)
+    copy_in_chunks(Show, (
+      {
+        'venue_id': rng.choice(venue_ids),
+        'artist_id': rng.choice(artist_ids),
+        'start_time': now + timedelta(minutes=rng.randint(-525600, 525600)),
+      }
+      for _ in range(shows)
+    ), chunk_size)
+    yield venue_ids, artist_ids
+  finally:
+    db.session.rollback()
+    synthetic_venues = select(Venue.id).where(Venue.website == MARKER)
+    synthetic_artists = select(Artist.id).where(Artist.website == MARKER)
+    db.session.execute(delete(Show).where(Show.venue_id.in_(synthetic_venues) | Show.artist_id.in_(synthetic_artists)))
+    db.session.execute(delete(Venue).where(Venue.website == MARKER))
+    db.session.execute(delete(Artist).where(Artist.website == MARKER))
+    db.session.commit()
@@ -0,0 +1,71 @@
+from datetime import datetime
+import click
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from benchmarks import benchmark_app, synthetic_catalogue
+from models import db, Venue, Artist, load_profile
+from async_reads import load_detail
+
+#----------------------------------------------------------------------------#
+# Load profiles.
+#----------------------------------------------------------------------------#
+# Rows and bytes the venue and artist pages fetch under the old mapping,
+# which joined every show into each load (lazy="joined"), against the load
+# profiles. Bytes are the length of the result values in Postgres' text
+# format, roughly what psycopg2 receives.
+
+def fetched(load):
+  """(statements, rows, bytes) of the results of the statements `load()` sends."""
+  sent = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    sent.append((statement, parameters))
+
+  db.session.expunge_all()
+  engine = db.session.get_bind()
+  event.listen(engine, 'before_cursor_execute', record)
+  try:
+    load()
+  finally:
+    event.remove(engine, 'before_cursor_execute', record)
+
+  rows = size = 0
+  connection = db.session.connection()
+  for statement, parameters in sent:
+    for row in connection.exec_driver_sql(statement, parameters):
+      rows += 1
+      size += sum(len(str(value)) for value in row if value is not None)
+  return len(sent), rows, size
+
+
+def cases(model, kind, entity_id):
+  """(page, before, after) loads of one model: the listing, and one entity's detail page."""
+  now = datetime.now()
+  return (
+    ('list',
+     lambda: model.query.options(joinedload(model.shows)).all(),
+     lambda: model.query.options(*load_profile(model, 'list')).all()),
+    ('detail',
+     lambda: model.query.options(joinedload(model.shows)).get(entity_id),
+     lambda: load_detail(kind, model, entity_id, now)),
+  )
+
+
+@click.command()
+@click.option('--entities', default=1000, show_default=True, help='Synthetic venues, and as many artists.')
+@click.option('--shows', default=20000, show_default=True, help='Synthetic shows spread over them.')
+def main(entities, shows):
+  """Compare the rows and bytes fetched with eager-joined shows and with the load profiles."""
+  app = benchmark_app()
+  with app.app_context(), synthetic_catalogue(entities, entities, shows) as (venue_ids, artist_ids):
+    click.echo(f'{"page":<16}{"":>8}{"statements":>12}{"rows":>12}{"bytes":>14}')
+    for model, kind, entity_id in ((Venue, 'venue', venue_ids[0]), (Artist, 'artist', artist_ids[0])):
+      for page, before, after in cases(model, kind, entity_id):
+        for label, load in (('before', before), ('after', after)):
+          statements, rows, size = fetched(load)
+          click.echo(f'{kind + " " + page:<16}{label:>8}{statements:>12}{rows:>12}{size:>14}')
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,101 @@
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import click
+from sqlalchemy import select
+from benchmarks import MARKER, benchmark_app, synthetic_catalogue, percentiles
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Load test.
+#----------------------------------------------------------------------------#
+# Throughput of the venue and artist detail pages with their queries run one
+# after the other (sync) and concurrently over asyncpg (ASYNC_READS). Each
+# mode runs in its own process, since a process holds one application;
+# `clients` threads request pages back to back through the WSGI app for
+# `seconds`. Per core is per CPU-second of the app process, Postgres' own
+# CPU left out.
+
+def detail_paths(limit=1000):
+  venue_ids = db.session.execute(select(Venue.id).where(Venue.website == MARKER).limit(limit)).scalars().all()
+  artist_ids = db.session.execute(select(Artist.id).where(Artist.website == MARKER).limit(limit)).scalars().all()
+  db.session.rollback()
+  return [f'/venues/{venue_id}' for venue_id in venue_ids] + [f'/artists/{artist_id}' for artist_id in artist_ids]
+
+
+def load_pages(mode, clients, seconds):
+  """Load the detail pages under `mode` ('sync' or 'async') in this process; returns its figures."""
+  app = benchmark_app(ASYNC_READS=mode == 'async')
+  with app.app_context():
+    paths = detail_paths()
+  timings = []
+  errors = []
+  deadline = time.perf_counter() + seconds
+
+  def client_loop(seed):
+    rng = random.Random(seed)
+    client = app.test_client()
+    while time.perf_counter() < deadline:
+      started = time.perf_counter()
+      response = client.get(rng.choice(paths))
+      elapsed = time.perf_counter() - started
+      if response.status_code == 200:
+        timings.append(elapsed * 1000)
+      else:
+        errors.append(response.status_code)
+
+  cpu_started, wall_started = time.process_time(), time.perf_counter()
+  threads = [threading.Thread(target=client_loop, args=(seed,)) for seed in range(clients)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+  # every request may have failed, e.g. on a pool timeout
+  p50, p99 = percentiles(timings, 50, 99) if len(timings) > 1 else (0.0, 0.0)
+  return {
+    "mode": mode,
+    "requests": len(timings),
+    "errors": len(errors),
+    "per_second": len(timings) / wall,
+    "per_cpu_second": len(timings) / cpu if cpu else 0.0,
+    "p50_ms": p50,
+    "p99_ms": p99,
+  }
+
+
+@click.command()
+@click.option('--entities', default=10000, show_default=True, help='Synthetic venues, and as many artists.')
+@click.option('--shows', default=200000, show_default=True, help='Synthetic shows spread over them.')
+@click.option('--clients', default=16, show_default=True, help='Concurrent clients.')
+@click.option('--seconds', default=30, show_default=True, help='Duration of each mode.')
+@click.option('--run-mode', type=click.Choice(['sync', 'async']), hidden=True)
+def main(entities, shows, clients, seconds, run_mode):
+  """Compare the detail pages' throughput with sync and async (ASYNC_READS) queries."""
+  if run_mode:
+    click.echo(json.dumps(load_pages(run_mode, clients, seconds)))
+    return
+  app = benchmark_app()
+  with app.app_context(), synthetic_catalogue(entities, entities, shows):
+    click.echo(f'{"mode":<8}{"requests":>10}{"errors":>8}{"req/s":>10}{"req/cpu-s":>11}{"p50 ms":>9}{"p99 ms":>9}')
+    for mode in ('sync', 'async'):
+      child = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.load_test', '--run-mode', mode, '--clients', str(clients), '--seconds', str(seconds)],
+        capture_output=True, text=True
+      )
+      if child.returncode:
+        # e.g. asyncpg missing for the async mode
+        click.echo(f'{mode:<8}failed:\n{child.stderr}', err=True)
+        continue
+      figures = json.loads(child.stdout.splitlines()[-1])
+      click.echo(
+        f'{mode:<8}{figures["requests"]:>10}{figures["errors"]:>8}{figures["per_second"]:>10.1f}'
+        f'{figures["per_cpu_second"]:>11.1f}{figures["p50_ms"]:>9.1f}{figures["p99_ms"]:>9.1f}'
+      )
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,53 @@
+import time
+import click
+from sqlalchemy import text
+from benchmarks import benchmark_app, synthetic_catalogue, percentiles
+from models import db, Venue, Artist
+from search import search_entities, search_shows
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+# p50 / p99 latency of the three searches over a synthetic catalogue of a
+# million venues and artists, for terms exercising each way a row can
+# match: a name word, a typo, a name fragment, a city and a genre.
+
+TERMS = ('velvet', 'velvte', 'orch', 'austin', 'jazz', 'midnight echo')
+
+SEARCHES = (
+  ('venues', lambda term: search_entities(Venue, term)),
+  ('artists', lambda term: search_entities(Artist, term)),
+  ('shows', lambda term: search_shows(term)),
+)
+
+
+@click.command()
+@click.option('--entities', default=500000, show_default=True, help='Synthetic venues, and as many artists.')
+@click.option('--shows', default=200000, show_default=True, help='Synthetic shows spread over them.')
+@click.option('--repeat', default=50, show_default=True, help='Runs of each search and term.')
+def main(entities, shows, repeat):
+  """Time the venue, artist and show searches over a synthetic catalogue."""
+  app = benchmark_app()
+  with app.app_context(), synthetic_catalogue(entities, entities, shows):
+    # fresh statistics, or the planner guesses at the new rows
+    db.session.execute(text('ANALYZE venue, artist, show'))
+    db.session.commit()
+    click.echo(f'{"search":<10}{"term":<16}{"matches":>10}{"p50 ms":>10}{"p99 ms":>10}')
+    for name, search in SEARCHES:
+      every = []
+      for term in TERMS:
+        timings = []
+        for _ in range(repeat):
+          started = time.perf_counter()
+          found = search(term)
+          timings.append((time.perf_counter() - started) * 1000)
+          db.session.rollback()
+        every += timings
+        p50, p99 = percentiles(timings, 50, 99)
+        click.echo(f'{name:<10}{term:<16}{found["count"]:>10}{p50:>10.1f}{p99:>10.1f}')
+      p50, p99 = percentiles(every, 50, 99)
+      click.echo(f'{name:<10}{"(all)":<16}{"":>10}{p50:>10.1f}{p99:>10.1f}')
+
+
+if __name__ == '__main__':
+  main()
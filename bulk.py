@@ -0,0 +1,43 @@
+import csv
+import io
+from sqlalchemy.types import TypeDecorator
+from models import db
+
+#----------------------------------------------------------------------------#
+# Bulk writes.
+#----------------------------------------------------------------------------#
+# COPY ... FROM STDIN, for the importer and the batch jobs that rewrite whole
+# tables (matches, similar venues / artists).
+
+def copy_literal(column, value):
+  """Render a value of `column` for COPY ... (FORMAT csv), including Postgres array literals."""
+  if isinstance(column.type, TypeDecorator):
+    # e.g. genre name lists, stored as a bitmask
+    value = column.type.process_bind_param(value, None)
+  if isinstance(value, list):
+    return '{' + ','.join('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value) + '}'
+  if isinstance(value, bool):
+    return 't' if value else 'f'
+  return value
+
+
+def copy_rows(model, rows):
+  """COPY dict rows (keyed by column key) into the model's table, in the session's transaction.
+
+  Rows may carry different keys (e.g. only some have an explicit id): each
+  set of keys is copied on its own, so an absent column takes its default.
+  """
+  groups = {}
+  for row in rows:
+    groups.setdefault(tuple(row), []).append(row)
+  cursor = db.session.connection().connection.cursor()
+  for keys, group in groups.items():
+    columns = [model.__table__.c[key] for key in keys]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in group:
+      writer.writerow([copy_literal(column, row[column.key]) for column in columns])
+    buffer.seek(0)
+    cursor.copy_expert(
+      f'COPY "{model.__tablename__}" ({", ".join(column.name for column in columns)}) FROM STDIN WITH (FORMAT csv)', buffer
+    )
@@ -0,0 +1,239 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from conditional import page_version
+from routing import reading_own_writes
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+MISSING = object()
+
+
+class LRUCache:
+  """In-process cache evicting the least recently used entry past `maxsize`.
+
+  Entries also expire `ttl` seconds after they were stored.
+  """
+
+  def __init__(self, maxsize=1024, ttl=60):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key, MISSING)
+      if entry is MISSING:
+        return MISSING
+      expires, value = entry
+      if expires < time.monotonic():
+        del self._entries[key]
+        return MISSING
+      self._entries.move_to_end(key)
+      return value
+
+  def get_many(self, keys):
+    return [self.get(key) for key in keys]
+
+  def set(self, key, value):
+    with self._lock:
+      self._entries[key] = (time.monotonic() + self.ttl, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        self._entries.pop(key, None)
+
+  def delete_prefix(self, prefix):
+    with self._lock:
+      for key in [key for key in self._entries if key.startswith(prefix)]:
+        del self._entries[key]
+
+  def __len__(self):
+    return len(self._entries)
+
+
+class SharedCache:
+  """Cache shared between processes through a Redis-protocol client.
+
+  `client` is anything exposing the redis-py calls used here (get, mget,
+  set, delete, scan_iter), so a local stand-in such as fakeredis works
+  the same way as a real Redis server.
+  """
+
+  def __init__(self, client, ttl=60, namespace='fyyur:'):
+    self.client = client
+    self.ttl = ttl
+    self.namespace = namespace
+
+  def get(self, key):
+    raw = self.client.get(self.namespace + key)
+    return MISSING if raw is None else pickle.loads(raw)
+
+  def get_many(self, keys):
+    if not keys:
+      return []
+    raws = self.client.mget([self.namespace + key for key in keys])
+    return [MISSING if raw is None else pickle.loads(raw) for raw in raws]
+
+  def set(self, key, value):
+    self.client.set(self.namespace + key, pickle.dumps(value), ex=self.ttl)
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*[self.namespace + key for key in keys])
+
+  def delete_prefix(self, prefix):
+    keys = list(self.client.scan_iter(match=self.namespace + prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
+
+  def __len__(self):
+    return sum(1 for _ in self.client.scan_iter(match=self.namespace + '*'))
+
+
+class NullCache:
+  """Backend that never stores anything; used when caching is disabled."""
+
+  def get(self, key):
+    return MISSING
+
+  def get_many(self, keys):
+    return [MISSING] * len(keys)
+
+  def set(self, key, value):
+    pass
+
+  def delete(self, *keys):
+    pass
+
+  def delete_prefix(self, prefix):
+    pass
+
+  def __len__(self):
+    return 0
+
+#----------------------------------------------------------------------------#
+# View cache.
+#----------------------------------------------------------------------------#
+
+class ViewCache:
+  """Read-through cache for computed view payloads, with hit/miss counters.
+
+  Entries are stored as (page version, payload) and only read back under
+  the same version (conditional.page_version), so writes made through other
+  processes, which cannot reach this process's entries, still miss here. A
+  replica-routed request stores what it read under its replica's version,
+  which a request reading a newer version never takes; requests reading
+  their own writes (routing.reading_own_writes) bypass the cache.
+  """
+
+  def __init__(self, backend=None):
+    self.backend = backend or NullCache()
+    self.hits = 0
+    self.misses = 0
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    kind = app.config.get('CACHE_BACKEND', 'lru')
+    ttl = app.config.get('CACHE_TTL', 60)
+    if kind == 'lru':
+      self.backend = LRUCache(app.config.get('CACHE_MAXSIZE', 1024), ttl)
+    elif kind == 'redis':
+      # optional dependency, only needed for the shared backend
+      import redis
+      self.backend = SharedCache(redis.Redis.from_url(app.config['CACHE_URL']), ttl)
+    elif kind == 'null':
+      self.backend = NullCache()
+    else:
+      raise ValueError(f'Unknown CACHE_BACKEND: {kind}')
+    app.extensions['view_cache'] = self
+
+  def _count(self, hits, misses):
+    with self._lock:
+      self.hits += hits
+      self.misses += misses
+
+  def get_or_build(self, key, builder):
+    """Return the cached value for `key`, calling `builder()` and storing its result on a miss."""
+    if reading_own_writes():
+      self._count(0, 1)
+      return builder()
+    version = page_version()
+    entry = self.backend.get(key)
+    if entry is not MISSING and entry[0] == version:
+      self._count(1, 0)
+      return entry[1]
+    self._count(0, 1)
+    value = builder()
+    self.backend.set(key, (version, value))
+    return value
+
+  def get_many(self, keys):
+    if reading_own_writes():
+      self._count(0, len(keys))
+      return [MISSING] * len(keys)
+    version = page_version()
+    values = [
+      entry[1] if entry is not MISSING and entry[0] == version else MISSING
+      for entry in self.backend.get_many(keys)
+    ]
+    misses = sum(1 for value in values if value is MISSING)
+    self._count(len(values) - misses, misses)
+    return values
+
+  def set(self, key, value):
+    if not reading_own_writes():
+      self.backend.set(key, (page_version(), value))
+
+  def invalidate(self, venues=(), artists=(), show_list=False):
+    """Drop the entries a write made stale; every argument names one family of keys."""
+    keys = [venue_key(venue_id) for venue_id in venues]
+    keys += [artist_key(artist_id) for artist_id in artists]
+    self.backend.delete(*keys)
+    if show_list:
+      self.backend.delete_prefix(SHOW_LIST_PREFIX)
+
+  def clear(self):
+    """Drop every entry, e.g. after a bulk load touched an unknown set of pages."""
+    self.backend.delete_prefix('')
+
+  def stats(self):
+    with self._lock:
+      hits, misses = self.hits, self.misses
+    lookups = hits + misses
+    return {
+      "backend": type(self.backend).__name__,
+      "entries": len(self.backend),
+      "hits": hits,
+      "misses": misses,
+      "hit_rate": hits / lookups if lookups else 0.0
+    }
+
+
+cache = ViewCache()
+
+#----------------------------------------------------------------------------#
+# Keys.
+#----------------------------------------------------------------------------#
+
+SHOW_LIST_PREFIX = 'shows:'
+
+
+def venue_key(venue_id):
+  return f'venue:{venue_id}'
+
+
+def artist_key(artist_id):
+  return f'artist:{artist_id}'
+
+
+def show_list_key(start, after):
+  return f'{SHOW_LIST_PREFIX}{start or ""}:{after or ""}'
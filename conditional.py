@@ -0,0 +1,50 @@
+import hashlib
+from functools import wraps
+from flask import current_app, g, has_app_context, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def make_etag(*parts):
+  """Strong ETag over the page URL, the template version and whatever the page depends on."""
+  key = repr((current_app.config['ETAG_VERSION'], request.full_path) + parts)
+  return hashlib.sha1(key.encode()).hexdigest()
+
+
+def page_version():
+  """Version tuple of the page being served, or None outside a conditional view.
+
+  The view cache stores it with every entry and treats an entry of another
+  version as missing, so a payload cached before a write made by another
+  process is never served under the new ETag.
+  """
+  return g.get('page_version') if has_app_context() else None
+
+
+def conditional(version):
+  """Answer If-None-Match with 304 before the view runs its queries.
+
+  `version(**view_args)` returns a tuple of the values the rendered page
+  depends on (timestamps, counts), or None when the view should simply run,
+  e.g. because the entity does not exist.
+  """
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      parts = g.page_version = version(**kwargs)
+      # A pending flash message must be rendered, so never skip the body then
+      if parts is None or '_flashes' in session:
+        return view(*args, **kwargs)
+
+      etag = make_etag(*parts)
+      if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+      else:
+        response = make_response(view(*args, **kwargs))
+      response.set_etag(etag)
+      # let browsers and the CDN store the page but revalidate it on every visit
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
@@ -1,14 +1,111 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+
+def env_flag(name, default):
+  return os.environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+# Every worker process must share the key, or sessions and flashes break between them
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode (FLASK_DEBUG=1 for local development).
+DEBUG = env_flag('FLASK_DEBUG', '0')
+
+# Outside debug mode and tests, the app log also goes to this file (empty: only stderr)
+ERROR_LOG = os.environ.get('ERROR_LOG', 'error.log')
 
 #to see the SQL queries 
 # SQLALCHEMY_ECHO = True
 
+# Per-request SQL profile: requests slower than SLOW_REQUEST_MS, or running one statement
+# more than N_PLUS_ONE_THRESHOLD times, are logged as JSON lines through the app logger, or only
+# to the SLOW_REQUEST_LOG file when one is set
+SQL_INSTRUMENTATION = env_flag('SQL_INSTRUMENTATION', '1')
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', '500'))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))
+SLOW_REQUEST_LOG = os.environ.get('SLOW_REQUEST_LOG')
+# Add a Server-Timing header (db, render, app time) to every response
+SERVER_TIMING = env_flag('SERVER_TIMING', '0')
+
+# Request count and latency histograms per endpoint, served at /metrics for Prometheus
+METRICS = env_flag('METRICS', '1')
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgresql://joannas@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://joannas@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per worker process: keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# under Postgres max_connections; /pool/stats shows how much of it is used.
+# DB_STATEMENT_TIMEOUT_MS (0 = none) makes Postgres cancel runaway statements.
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '0'))
+SQLALCHEMY_ENGINE_OPTIONS = {
+  'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+  'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+  'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+  'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+  'pool_pre_ping': env_flag('DB_POOL_PRE_PING', '1'),
+}
+if DB_STATEMENT_TIMEOUT_MS:
+  SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'}
+
+# Read replicas (comma-separated URLs) serving GET requests and searches; each gets the pool
+# settings above. A user's requests stay on the primary this long after they write something.
+REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+
+# Number of shows rendered per /shows page
+SHOWS_PER_PAGE = 60
+
+# Shows rendered per section of a venue / artist page; older past shows load on request
+DETAIL_UPCOMING_SHOWS = 30
+DETAIL_PAST_SHOWS = 12
+
+# View payload cache: 'lru' (per process), 'redis' (shared, needs the redis package) or 'null'
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://localhost:6379/0')
+CACHE_TTL = 60
+CACHE_MAXSIZE = 1024
+
+# How often the background thread moves started shows from the upcoming to the past
+# counters (0: only `flask counters rollover`, e.g. from cron)
+COUNTERS_ROLLOVER_SECONDS = 60
+
+# Part of every page ETag; bump it when templates change so clients refetch
+ETAG_VERSION = '4'
+
+# The /venues, /artists and /shows pages are sent as they render, in chunks of this many
+# characters; filtered listings fetch LISTING_YIELD_PER rows per server-side cursor round trip
+STREAM_CHUNK_SIZE = 16384
+LISTING_YIELD_PER = 500
+
+# Rows fetched per server-side cursor round trip when streaming API collections
+API_STREAM_BATCH = 1000
+
+# Ranked search results per page
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Matchmaking: best pairs kept per venue / artist, score weights (matchmaking.DEFAULT_WEIGHTS
+# for the keys) and whether edits rescore their pairs in the background
+MATCHES_PER_ENTITY = 20
+MATCH_WEIGHTS = {'genres': 1.0, 'state': 0.2, 'city': 0.5, 'history': 0.3}
+MATCH_REFRESH = True
+
+# "You may also like": neighbours kept per venue / artist, score weights (recommendations.DEFAULT_WEIGHTS
+# for the keys), and how often the background thread rebuilds them (0 or SIMILAR_REBUILD off: only the CLI)
+SIMILAR_PER_ENTITY = 6
+SIMILAR_WEIGHTS = {'genres': 1.0, 'counterparts': 1.0}
+SIMILAR_REBUILD = True
+SIMILAR_REBUILD_SECONDS = 3600
+
+# Typeahead: names are answered from an in-process prefix index, rebuilt in the background
+SUGGEST_INDEX = True
+SUGGEST_REBUILD_SECONDS = 300
+SUGGEST_LIMIT = 10
+
+# Run the independent queries of detail pages concurrently over asyncpg (needs the asyncpg package);
+# its pools take the engine options above, with ASYNC_READS_POOL_SIZE connections each
+ASYNC_READS = False
+ASYNC_READS_POOL_SIZE = 10
@@ -0,0 +1,197 @@
+import time
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, text, update
+from background import run_in_background
+from models import db, Venue, Artist, Show, ShowCounterClock, commit_with_retry
+from queries import counter_clock
+from cache import cache
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+# Venue and artist rows carry upcoming_shows_count / past_shows_count, split
+# at ShowCounterClock.rolled_over_at. A trigger on show keeps them current as
+# shows are written (including cascades and COPY imports); the rollover,
+# run every COUNTERS_ROLLOVER_SECONDS in the background or by `flask counters
+# rollover`, moves shows that have started since the last run from upcoming
+# to past and advances the clock.
+
+COUNTED = (
+  (Venue, Show.venue_id),
+  (Artist, Show.artist_id),
+)
+
+
+def lock_shows():
+  """Hold show writes until commit and wait for those in flight, so the clock and the rows agree."""
+  db.session.execute(text('LOCK TABLE show IN SHARE MODE'))
+
+
+def roll_over(now):
+  """Move shows started in (clock, now] from upcoming to past and set the clock to `now`.
+
+  Returns the ids of the venues and artists whose counters changed. The show
+  table is locked before any venue or artist row, the order every writer of
+  shows follows.
+  """
+  lock_shows()
+  clock = db.session.get(ShowCounterClock, 1, with_for_update=True)
+  since = clock.rolled_over_at
+  changed = {}
+  if now > since:
+    for model, fk_column in COUNTED:
+      started = db.session.query(
+        fk_column.label('entity_id'),
+        func.count(Show.id).label('started')
+      ).filter(
+        Show.start_time > since, Show.start_time <= now
+      ).group_by(
+        fk_column
+      ).subquery()
+      rows = db.session.execute(
+        update(model).where(
+          model.id == started.c.entity_id
+        ).values(
+          upcoming_shows_count=model.upcoming_shows_count - started.c.started,
+          past_shows_count=model.past_shows_count + started.c.started,
+          # counters are derived state, not an edit of the venue or artist
+          updated_at=model.updated_at
+        ).returning(model.id),
+        execution_options={'synchronize_session': False}
+      )
+      changed[model] = [row.id for row in rows]
+    clock.rolled_over_at = now
+  db.session.commit()
+  return changed
+
+
+def rollover_due(now):
+  """Whether a show started in (clock, now], checked without taking the locks of roll_over."""
+  clock = counter_clock()
+  return db.session.query(Show.id).filter(Show.start_time > clock, Show.start_time <= now).first() is not None
+
+
+def roll_over_and_invalidate(now):
+  """roll_over, then drop the cached pages showing the changed counters; returns (venue ids, artist ids)."""
+  changed = commit_with_retry(lambda: roll_over(now))
+  venue_ids, artist_ids = changed.get(Venue, []), changed.get(Artist, [])
+  cache.invalidate(venues=venue_ids, artists=artist_ids)
+  return venue_ids, artist_ids
+
+
+def counter_drift(model, fk_column):
+  """Rows of `model` whose counters disagree with the show table, as (id, upcoming, past, expected upcoming, expected past)."""
+  clock = counter_clock()
+  counts = db.session.query(
+    fk_column.label('entity_id'),
+    func.count(Show.id).filter(Show.start_time > clock).label('upcoming'),
+    func.count(Show.id).filter(Show.start_time <= clock).label('past')
+  ).group_by(
+    fk_column
+  ).subquery()
+  upcoming = func.coalesce(counts.c.upcoming, 0)
+  past = func.coalesce(counts.c.past, 0)
+  return db.session.query(
+    model.id,
+    model.upcoming_shows_count,
+    model.past_shows_count,
+    upcoming.label('expected_upcoming'),
+    past.label('expected_past')
+  ).outerjoin(
+    counts, counts.c.entity_id == model.id
+  ).filter(
+    (model.upcoming_shows_count != upcoming) | (model.past_shows_count != past)
+  ).order_by(
+    model.id
+  ).all()
+
+#----------------------------------------------------------------------------#
+# Rollover.
+#----------------------------------------------------------------------------#
+
+class CounterRollover:
+  """Rolls the counters over every COUNTERS_ROLLOVER_SECONDS in a background thread.
+
+  Every serving process runs the thread; the first to see a started show
+  rolls over and the others then find nothing due, so they never queue on
+  the show lock. Other processes' cached pages expire after CACHE_TTL.
+  """
+
+  def __init__(self):
+    self.interval = 60
+
+  def init_app(self, app):
+    app.extensions['counter_rollover'] = self
+    self.interval = app.config.get('COUNTERS_ROLLOVER_SECONDS', 60)
+    if not self.interval:
+      return
+
+    def run():
+      while True:
+        with app.app_context():
+          try:
+            now = datetime.now()
+            if rollover_due(now):
+              venue_ids, artist_ids = roll_over_and_invalidate(now)
+              app.logger.info('counters: rolled over %d venues and %d artists', len(venue_ids), len(artist_ids))
+            else:
+              db.session.rollback()
+          except Exception:
+            db.session.rollback()
+            app.logger.exception('counters rollover failed')
+        time.sleep(self.interval)
+
+    run_in_background(app, 'counter_rollover', run)
+
+
+counter_rollover = CounterRollover()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('counters')
+def counters_command():
+  """Maintain the upcoming / past show counters of venues and artists."""
+
+
+@counters_command.command('rollover')
+@with_appcontext
+def rollover_command():
+  """Move shows that have started since the last run from upcoming to past; also done in the background every COUNTERS_ROLLOVER_SECONDS."""
+  venue_ids, artist_ids = roll_over_and_invalidate(datetime.now())
+  click.echo(f'Rolled over {len(venue_ids)} venues and {len(artist_ids)} artists')
+
+
+@counters_command.command('check')
+@click.option('--fix', is_flag=True, help='Rewrite the counters that drifted.')
+@with_appcontext
+def check_command(fix):
+  """Reconcile the counters against the show table; exits 1 when drift is found and not fixed."""
+  lock_shows()
+  drifted = 0
+  for model, fk_column in COUNTED:
+    for row in counter_drift(model, fk_column):
+      drifted += 1
+      click.echo(
+        f'{model.__tablename__} {row.id}: upcoming {row.upcoming_shows_count} (expected {row.expected_upcoming}), '
+        f'past {row.past_shows_count} (expected {row.expected_past})'
+      )
+      if fix:
+        db.session.execute(
+          # a correction of what the pages show, so updated_at (and the pages' ETags) move
+          update(model).where(model.id == row.id).values(
+            upcoming_shows_count=row.expected_upcoming,
+            past_shows_count=row.expected_past
+          ),
+          execution_options={'synchronize_session': False}
+        )
+  db.session.commit()
+
+  if fix and drifted:
+    cache.clear()
+  click.echo(f'{drifted} counters drifted' + (', fixed' if fix and drifted else ''))
+  if drifted and not fix:
+    raise click.exceptions.Exit(1)
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from itertools import islice
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import or_
+from models import db, Venue, Artist, Show, public_columns
+from queries import show_query
+
+#----------------------------------------------------------------------------#
+# Rows.
+#----------------------------------------------------------------------------#
+
+EXPORT_MODELS = {
+  'venues': Venue,
+  'artists': Artist,
+  'shows': Show,
+}
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'columnar')
+
+# Extra columns of a joined show export
+JOINED_SHOW_FIELDS = ('venue_name', 'artist_name', 'artist_image_link')
+
+
+def export_fields(entity, joined=False):
+  fields = public_columns(EXPORT_MODELS[entity])
+  if entity == 'shows' and joined:
+    fields += JOINED_SHOW_FIELDS
+  return fields
+
+
+def export_rows(entity, since=None, joined=False, yield_per=1000):
+  """Stream every row of `entity` as a dict, through a server-side cursor.
+
+  `since` keeps only rows written after it: venues and artists by updated_at,
+  shows by created_at (or by a write to their venue or artist when joined,
+  since the joined names come from there).
+  """
+  model = EXPORT_MODELS[entity]
+  if entity == 'shows':
+    query = show_query(('id', 'venue_id', 'artist_id', 'start_time')) if not joined else show_query()
+    query = query.add_columns(Show.created_at)
+    if since is not None:
+      if joined:
+        query = query.filter(or_(Show.created_at > since, Venue.updated_at > since, Artist.updated_at > since))
+      else:
+        query = query.filter(Show.created_at > since)
+  else:
+    query = db.session.query(*[getattr(model, field) for field in public_columns(model)])
+    if since is not None:
+      query = query.filter(model.updated_at > since)
+
+  fields = export_fields(entity, joined)
+  rows = query.order_by(model.id).execution_options(yield_per=yield_per)
+  for row in rows:
+    mapping = row._mapping
+    yield {field: mapping[field] for field in fields}
+
+#----------------------------------------------------------------------------#
+# Encoders.
+#----------------------------------------------------------------------------#
+
+def to_json(value):
+  return json.dumps(value, default=_json_default)
+
+
+def _json_default(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _csv_value(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  if isinstance(value, list):
+    # same separator the importer splits genres on
+    return ';'.join(value)
+  return value
+
+
+def encode(rows, fields, fmt, chunk_size=1000):
+  """Encode dict rows as text chunks of `chunk_size` rows each.
+
+  'columnar' emits one JSON document per chunk holding a list of values per
+  column, which columnar stores (Parquet, Arrow, pandas) load without pivoting.
+  """
+  rows = iter(rows)
+  if fmt == 'csv':
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+  while True:
+    chunk = list(islice(rows, chunk_size))
+    if not chunk:
+      break
+    if fmt == 'csv':
+      for row in chunk:
+        writer.writerow([_csv_value(row[field]) for field in fields])
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+    elif fmt == 'ndjson':
+      yield ''.join(to_json(row) + '\n' for row in chunk)
+    else:
+      yield to_json({
+        "rows": len(chunk),
+        "columns": {field: [row[field] for row in chunk] for field in fields}
+      }) + '\n'
+  if fmt == 'csv' and buffer.tell():
+    yield buffer.getvalue()
+
+
+def write_parquet(rows, fields, path, chunk_size=1000):
+  """Write dict rows to a Parquet file one row group per chunk; needs pyarrow."""
+  # optional dependency, only needed for Parquet output
+  import pyarrow
+  import pyarrow.parquet
+
+  rows = iter(rows)
+  writer = None
+  try:
+    while True:
+      chunk = list(islice(rows, chunk_size))
+      if not chunk:
+        break
+      table = pyarrow.Table.from_pydict({field: [row[field] for row in chunk] for field in fields})
+      if writer is None:
+        writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+      writer.write_table(table)
+  finally:
+    if writer is not None:
+      writer.close()
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('export')
+@click.argument('entity', type=click.Choice(list(EXPORT_MODELS)))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS + ('parquet',)), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False), help='Defaults to stdout; required for parquet.')
+@click.option('--since', type=click.DateTime(), help='Only rows written after this time.')
+@click.option('--joined', is_flag=True, help='Add venue and artist names to exported shows.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows fetched and encoded at a time.')
+@with_appcontext
+def export_command(entity, fmt, output, since, joined, chunk_size):
+  """Stream venues, artists or shows out as CSV, NDJSON, columnar JSON or Parquet."""
+  fields = export_fields(entity, joined)
+  rows = export_rows(entity, since, joined, chunk_size)
+
+  if fmt == 'parquet':
+    if not output:
+      raise click.UsageError('--output is required for parquet')
+    write_parquet(rows, fields, output, chunk_size)
+    return
+
+  with click.open_file(output or '-', 'w') as stream:
+    for text in encode(rows, fields, fmt, chunk_size):
+      stream.write(text)
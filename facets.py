@@ -0,0 +1,84 @@
+from sqlalchemy import false, func
+from enums import Genre
+from genres import GENRE_BITS, all_genres
+from models import db, FacetCount
+
+#----------------------------------------------------------------------------#
+# Facets.
+#----------------------------------------------------------------------------#
+# /venues and /artists filter on ?genre=, ?state= and ?city=. The counts next
+# to each facet value come from facet_count, which a trigger keeps current as
+# venues and artists are written, so browsing never scans the entity tables.
+
+FACETS = ('genre', 'state', 'city')
+
+
+def requested_facets(args):
+  """Facet filters present in a query string, e.g. {'genre': 'Jazz', 'state': 'NY'}."""
+  return {facet: args[facet] for facet in FACETS if args.get(facet)}
+
+
+def facet_criteria(model, filters):
+  """Filter expressions of `model` for the requested facets; genres are tested bitwise on the genre mask."""
+  criteria = []
+  if 'genre' in filters:
+    genre = filters['genre']
+    criteria.append(all_genres(model.genres, [genre]) if genre in GENRE_BITS else false())
+  if 'state' in filters:
+    criteria.append(model.state == filters['state'])
+  if 'city' in filters:
+    criteria.append(model.city == filters['city'])
+  return criteria
+
+
+def genre_label(name):
+  try:
+    return Genre[name].value
+  except KeyError:
+    return name
+
+
+def facet_counts(kind, filters):
+  """Values of each facet with their counts, under the filters of the other facets.
+
+  A facet ignores its own filter so the alternatives to the current choice
+  stay listed. Each facet comes as {"values", "clear"}: every value holds its
+  label, count, whether it is selected and the query arguments (`args`)
+  selecting it on top of the current filters; `clear` are the arguments
+  without the facet. A city also selects its state since city names repeat
+  across states, and changing the state drops the city.
+  """
+  counts = {}
+  for facet in FACETS:
+    # cities sit under their state: the state facet ignores the city filter too
+    dropped = ('state', 'city') if facet == 'state' else (facet,)
+    clear = {key: value for key, value in filters.items() if key not in dropped}
+
+    columns = (FacetCount.state, FacetCount.city) if facet == 'city' else (getattr(FacetCount, facet),)
+    total = func.sum(FacetCount.count)
+    rows = db.session.query(*columns, total.label('count')).filter(FacetCount.entity == kind)
+    for location in ('state', 'city'):
+      if location in clear:
+        rows = rows.filter(getattr(FacetCount, location) == clear[location])
+    if facet == 'genre':
+      rows = rows.filter(FacetCount.genre != '')
+    else:
+      rows = rows.filter(FacetCount.genre == filters.get('genre', ''))
+    rows = rows.group_by(*columns).having(total > 0).order_by(*columns)
+
+    values = []
+    for row in rows:
+      if facet == 'genre':
+        selects, label = {"genre": row.genre}, genre_label(row.genre)
+      elif facet == 'state':
+        selects, label = {"state": row.state}, row.state
+      else:
+        selects, label = {"state": row.state, "city": row.city}, f'{row.city}, {row.state}'
+      values.append({
+        "label": label,
+        "count": row.count,
+        "selected": all(filters.get(key) == value for key, value in selects.items()),
+        "args": dict(clear, **selects)
+      })
+    counts[facet] = {"values": values, "clear": clear}
+  return counts
@@ -0,0 +1,52 @@
+from functools import lru_cache
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+# babel.dates.format_datetime parses its locale and its pattern on every call.
+# Here both are parsed once per (format, locale), and formatted timestamps
+# are kept in an LRU, since a listing repeats the same start times a lot.
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+DEFAULT_LOCALE = 'en'
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale=DEFAULT_LOCALE):
+  """(DateTimePattern, Locale) of a named format ('full', 'medium') or a raw Babel pattern."""
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=8192)
+def _format(value, format, locale):
+  pattern, parsed_locale = compiled_pattern(format, locale)
+  return pattern.apply(value, parsed_locale)
+
+
+def to_datetime(value):
+  # payloads cached before start times were kept as datetimes hold strings
+  return dateutil.parser.parse(value) if isinstance(value, str) else value
+
+
+def format_datetime(value, format='medium', locale=DEFAULT_LOCALE):
+  """Format one datetime (or ISO / dateutil-parsable string); the Jinja `datetime` filter."""
+  return _format(to_datetime(value), format, locale)
+
+
+def format_datetimes(values, format='medium', locale=DEFAULT_LOCALE):
+  """Format a column of datetimes in one call, each distinct value once; the Jinja `datetimes` filter."""
+  formatted = {}
+  result = []
+  for value in values:
+    text = formatted.get(value)
+    if text is None:
+      text = formatted[value] = _format(to_datetime(value), format, locale)
+    result.append(text)
+  return result
@@ -4,6 +4,7 @@ from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
 from wtforms.validators import DataRequired, AnyOf, URL, Optional
 import re
 from enums import Genre, State
+from genres import valid_genres
 
 def is_valid_phone(number):
     """ Validate phone numbers like:
@@ -168,7 +169,7 @@ class VenueForm(Form):
             self.phone.errors.append('Invalid phone.')
             return False
 
-        if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+        if not valid_genres(self.genres.data):
             self.genres.errors.append('Invalid genres.')
             return False
 
@@ -232,7 +233,7 @@ class ArtistForm(Form):
             self.phone.errors.append('Invalid phone.')
             return False
 
-        if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+        if not valid_genres(self.genres.data):
             self.genres.errors.append('Invalid genres.')
             return False
 
@@ -0,0 +1,149 @@
+import functools
+import numpy
+from sqlalchemy import Integer, literal
+from sqlalchemy.types import TypeDecorator
+from enums import Genre
+
+#----------------------------------------------------------------------------#
+# Genre bitmask.
+#----------------------------------------------------------------------------#
+# Venue and artist genres are stored as one integer, bit i standing for the
+# i-th member of enums.Genre. New genres must be appended to the enum, never
+# inserted or reordered, or the stored masks change meaning; the migration
+# keeps its own frozen copy of the bit table for the same reason.
+
+GENRE_BITS = {genre.name: 1 << index for index, genre in enumerate(Genre)}
+
+
+def genre_mask(names):
+  """Bitmask of Genre member names (what the forms post); raises KeyError on unknown names."""
+  mask = 0
+  for name in names:
+    mask |= GENRE_BITS[name]
+  return mask
+
+
+def genre_names(mask):
+  """Genre member names set in `mask`, in enum order."""
+  return [name for name, bit in GENRE_BITS.items() if mask & bit]
+
+
+def valid_genres(names):
+  return GENRE_BITS.keys() >= set(names)
+
+
+class GenreMask(TypeDecorator):
+  """Integer column read and written as a list of genre names."""
+
+  impl = Integer
+  cache_ok = True
+
+  def process_bind_param(self, value, dialect):
+    if value is None or isinstance(value, int):
+      return value
+    return genre_mask(value)
+
+  def process_result_value(self, value, dialect):
+    return None if value is None else genre_names(value)
+
+#----------------------------------------------------------------------------#
+# SQL filters.
+#----------------------------------------------------------------------------#
+
+def _masked(column, mask):
+  return column.op('&', return_type=Integer)(literal(mask, Integer))
+
+
+def any_genre(column, names):
+  """`column` has at least one of the genres `names`."""
+  return _masked(column, genre_mask(names)) != 0
+
+
+def all_genres(column, names):
+  """`column` has every one of the genres `names`."""
+  mask = genre_mask(names)
+  return _masked(column, mask) == mask
+
+#----------------------------------------------------------------------------#
+# Genre matrix.
+#----------------------------------------------------------------------------#
+
+class GenreMatrix:
+  """Genres of many venues or artists as a NumPy 0/1 matrix, for comparing against all of them at once.
+
+  Row i holds entity `ids[i]`, column j the j-th Genre. Build it with
+  queries.genre_matrix.
+  """
+
+  def __init__(self, ids, masks):
+    self.ids = numpy.asarray(ids, dtype=numpy.int64)
+    self.masks = numpy.asarray(masks, dtype=numpy.int64)
+    self.bits = ((self.masks[:, None] >> numpy.arange(len(GENRE_BITS))) & 1).astype(numpy.float32)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def vector(self, mask):
+    """0/1 genre vector of one mask, shaped like a row of the matrix."""
+    return ((mask >> numpy.arange(len(GENRE_BITS))) & 1).astype(numpy.float32)
+
+  def any(self, mask):
+    """Boolean array: which rows share at least one genre with `mask`."""
+    return (self.masks & mask) != 0
+
+  def all(self, mask):
+    """Boolean array: which rows have every genre of `mask`."""
+    return (self.masks & mask) == mask
+
+  def overlap(self, mask):
+    """Number of genres each row shares with `mask`."""
+    return self.bits @ self.vector(mask)
+
+  def pairwise_overlap(self, other, rows=slice(None)):
+    """Shared genre counts between `rows` of this matrix (all by default) and every row of `other`."""
+    return self.bits[rows] @ other.bits.T
+
+  def nearest(self, limit):
+    """(row, other row) positions pairing every row with `limit` others of the highest Jaccard similarity to it.
+
+    Rows sharing a mask have the same neighbours, so masks are ranked once
+    per distinct mask; ties are broken by position.
+    """
+    distinct, inverse, sizes = numpy.unique(self.masks, return_inverse=True, return_counts=True)
+    members = numpy.argsort(inverse.ravel(), kind='stable')
+    bounds = numpy.concatenate([[0], numpy.cumsum(sizes)])
+    picked_rows, picked_others = [numpy.zeros(0, dtype=numpy.int64)], [numpy.zeros(0, dtype=numpy.int64)]
+    for code, mask in enumerate(distinct.tolist()):
+      ranked = numpy.argsort(-mask_jaccard(distinct, mask), kind='stable')
+      # one more than `limit`, as the rows of `mask` find themselves among them
+      taken = ranked[:numpy.searchsorted(numpy.cumsum(sizes[ranked]), limit + 1) + 1]
+      others = numpy.concatenate([members[bounds[other]:bounds[other + 1]] for other in taken])[:limit + 1]
+      rows = members[bounds[code]:bounds[code + 1]]
+      row_positions, other_positions = numpy.repeat(rows, len(others)), numpy.tile(others, len(rows))
+      distinct_pair = row_positions != other_positions
+      picked_rows.append(row_positions[distinct_pair])
+      picked_others.append(other_positions[distinct_pair])
+    return numpy.concatenate(picked_rows), numpy.concatenate(picked_others)
+
+  def jaccard(self, mask):
+    """Shared over combined genres of each row and `mask`; 0 where both are empty."""
+    shared = self.overlap(mask)
+    combined = self.bits.sum(axis=1) + self.vector(mask).sum() - shared
+    return numpy.divide(shared, combined, out=numpy.zeros_like(shared), where=combined > 0)
+
+
+@functools.lru_cache(maxsize=None)
+def _genre_counts():
+  masks = numpy.arange(1 << len(GENRE_BITS))
+  return sum((masks >> bit) & 1 for bit in range(len(GENRE_BITS))).astype(numpy.float32)
+
+
+def mask_jaccard(left, right):
+  """Shared over combined genres of NumPy arrays of masks, elementwise (broadcasting); 0 where both are empty."""
+  counts = _genre_counts()
+  return counts[left & right] / numpy.maximum(counts[left | right], 1)
+
+
+def shared_genres(left, right):
+  """Number of genres shared by NumPy arrays of masks, elementwise."""
+  return _genre_counts()[left & right].astype('int64')
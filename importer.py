@@ -0,0 +1,225 @@
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert, text, update
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+from bulk import copy_rows
+from cache import cache
+
+#----------------------------------------------------------------------------#
+# Row conversion.
+#----------------------------------------------------------------------------#
+
+# Values a CSV cell may use for an unchecked checkbox
+FALSE_VALUES = {'', '0', 'false', 'f', 'no', 'n'}
+
+# entity -> (model, form validating its rows, boolean form fields, form field -> column renames)
+ENTITIES = {
+  'venues': (Venue, VenueForm, ('seeking_talent',), {'website_link': 'website'}),
+  'artists': (Artist, ArtistForm, ('seeking_venue',), {'website_link': 'website'}),
+  'shows': (Show, ShowForm, (), {}),
+}
+
+
+def read_rows(stream, fmt):
+  """Yield (line number, dict) pairs from a CSV or NDJSON stream, one row at a time."""
+  if fmt == 'csv':
+    for index, row in enumerate(csv.DictReader(stream), start=2):
+      yield index, row
+  else:
+    for index, line in enumerate(stream, start=1):
+      if line.strip():
+        yield index, json.loads(line)
+
+
+def to_formdata(row, booleans):
+  """Shape a raw row like the form POST it replaces.
+
+  Genres come as a list (NDJSON) or ';'-separated (CSV) and become repeated
+  keys; unchecked booleans are left out, exactly as a browser would.
+  """
+  formdata = MultiDict()
+  for key, value in row.items():
+    if value is None:
+      continue
+    if key == 'genres':
+      genres = value if isinstance(value, list) else value.split(';')
+      for genre in genres:
+        if genre.strip():
+          formdata.add('genres', genre.strip())
+    elif key in booleans:
+      if str(value).strip().lower() not in FALSE_VALUES:
+        formdata.add(key, 'y')
+    else:
+      formdata.add(key, str(value))
+  return formdata
+
+
+def validate_row(model, form_class, booleans, renames, row):
+  """Validate a row with the entity's form; returns (column values, errors)."""
+  form = form_class(formdata=to_formdata(row, booleans), meta={'csrf': False})
+  if not form.validate():
+    return None, [(field, error) for field, errors in form.errors.items() for error in errors]
+
+  values = {renames.get(name, name): field.data for name, field in form._fields.items()}
+  # a browser posts every field, so absent text fields are empty rather than NULL
+  values = {
+    column: '' if value is None else value
+    for column, value in values.items() if column in model.__table__.columns
+  }
+  try:
+    if row.get('id'):
+      values['id'] = int(row['id'])
+    if model is Show:
+      values['venue_id'] = int(values['venue_id'])
+      values['artist_id'] = int(values['artist_id'])
+  except ValueError:
+    return None, [('id', 'Not a valid id.')]
+  return values, []
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+def missing_references(rows):
+  """Positions of show rows whose venue or artist does not exist, checked with one query per table."""
+  venue_ids = {row['venue_id'] for row in rows}
+  artist_ids = {row['artist_id'] for row in rows}
+  known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+  known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+
+  missing = {}
+  for position, row in enumerate(rows):
+    if row['venue_id'] not in known_venues:
+      missing[position] = ('venue_id', 'Venue not found')
+    elif row['artist_id'] not in known_artists:
+      missing[position] = ('artist_id', 'Artist not found')
+  return missing
+
+
+def touch_counterparts(rows):
+  """Bump updated_at of the venues and artists of show rows: their counters and show lists change, and so must their ETags."""
+  now = datetime.now()
+  for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+    db.session.execute(
+      update(model).where(model.id.in_({row[key] for row in rows})).values(updated_at=now),
+      execution_options={'synchronize_session': False}
+    )
+
+
+def load_chunk(model, rows, method):
+  """Insert one validated chunk in a single round trip and commit it."""
+  if method == 'copy':
+    copy_rows(model, rows)
+  else:
+    db.session.execute(insert(model), rows)
+  if model is Show:
+    touch_counterparts(rows)
+  db.session.commit()
+
+
+def rebuild_derived():
+  """Rescore the matches and rebuild the neighbour tables, which read every venue, artist and show."""
+  matchmaker = current_app.extensions['matchmaker']
+  recommendations = current_app.extensions['recommendations']
+  started = time.perf_counter()
+  kept = matchmaker.rebuild()
+  click.echo(f'Kept {kept} matches in {time.perf_counter() - started:.1f}s')
+  for kind in ('venue', 'artist'):
+    started = time.perf_counter()
+    kept = recommendations.rebuild(kind)
+    if kept is not None:
+      click.echo(f'Kept {kept} similar {kind}s in {time.perf_counter() - started:.1f}s')
+
+
+def sync_sequence(model):
+  """Move the id sequence past explicitly imported ids."""
+  db.session.execute(text(
+    f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+    f"COALESCE((SELECT MAX(id) FROM \"{model.__tablename__}\"), 1))"
+  ))
+  db.session.commit()
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('import')
+@click.argument('entity', type=click.Choice(list(ENTITIES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows validated and loaded per transaction.')
+@click.option('--method', type=click.Choice(['executemany', 'copy']), default='executemany', show_default=True)
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), help='Per-row error report (CSV); defaults to PATH.errors.csv.')
+@click.option('--rebuild/--no-rebuild', default=True, show_default=True, help='Rebuild the matches and similar venues / artists afterwards.')
+@with_appcontext
+def import_command(entity, path, fmt, chunk_size, method, errors_path, rebuild):
+  """Bulk load venues, artists or shows from a CSV or NDJSON file.
+
+  Rows are validated with the same forms as the web pages, show references
+  are resolved per chunk, and every chunk is loaded and committed at once.
+  The cache is cleared in this process only: per-process caches of the
+  running servers ('lru' backend) serve old pages until CACHE_TTL.
+  """
+  model, form_class, booleans, renames = ENTITIES[entity]
+  fmt = fmt or ('csv' if path.endswith('.csv') else 'ndjson')
+  errors_path = errors_path or path + '.errors.csv'
+  read = loaded = rejected = 0
+  explicit_ids = False
+  started = time.perf_counter()
+
+  with open(path, newline='') as stream, open(errors_path, 'w', newline='') as report:
+    errors = csv.writer(report)
+    errors.writerow(['line', 'field', 'message'])
+    rows = read_rows(stream, fmt)
+
+    while True:
+      chunk = list(islice(rows, chunk_size))
+      if not chunk:
+        break
+      read += len(chunk)
+
+      valid, lines = [], []
+      for line, row in chunk:
+        values, row_errors = validate_row(model, form_class, booleans, renames, row)
+        for field, message in row_errors:
+          errors.writerow([line, field, message])
+        if values is None:
+          rejected += 1
+          continue
+        explicit_ids = explicit_ids or 'id' in values
+        valid.append(values)
+        lines.append(line)
+
+      if model is Show and valid:
+        missing = missing_references(valid)
+        for position, (field, message) in missing.items():
+          errors.writerow([lines[position], field, message])
+        rejected += len(missing)
+        valid = [row for position, row in enumerate(valid) if position not in missing]
+
+      if valid:
+        load_chunk(model, valid, method)
+        loaded += len(valid)
+      click.echo(f'{read} rows read, {loaded} loaded, {rejected} rejected', err=True)
+
+  if explicit_ids:
+    sync_sequence(model)
+  cache.clear()
+
+  elapsed = time.perf_counter() - started
+  click.echo(
+    f'Imported {loaded} of {read} {entity} in {elapsed:.1f}s '
+    f'({loaded / elapsed if elapsed else 0:.0f} rows/s); {rejected} rejected, see {errors_path}'
+  )
+  if current_app.config.get('CACHE_BACKEND') == 'lru':
+    click.echo(f"Running servers keep their cached pages for up to {current_app.config.get('CACHE_TTL')}s")
+  if loaded and rebuild:
+    rebuild_derived()
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request profiles.
+#----------------------------------------------------------------------------#
+
+class RequestProfile:
+  """What one request spent: SQL statements, DB time, rows and template render time."""
+
+  def __init__(self):
+    self.started = time.perf_counter()
+    self.statements = 0
+    self.db_seconds = 0.0
+    self.rows = 0
+    self.render_seconds = 0.0
+    self.shapes = Counter()
+
+  def repeated(self, threshold):
+    """Statements run more than `threshold` times in the request: the signature of an N+1 loop."""
+    return [(statement, count) for statement, count in self.shapes.most_common() if count > threshold]
+
+
+def current_profile():
+  return g.get('profile') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+  conn.info['statement_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+  profile = current_profile()
+  if profile is None:
+    return
+  profile.statements += 1
+  profile.db_seconds += time.perf_counter() - conn.info['statement_started']
+  # drivers report -1 when they do not know (server-side cursors, sqlite SELECTs)
+  profile.rows += max(cursor.rowcount, 0)
+  profile.shapes[statement] += 1
+
+
+class TimedTemplate(Template):
+  """Jinja template adding its render time to the request profile."""
+
+  def render(self, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+      return super().render(*args, **kwargs)
+    finally:
+      profile = current_profile()
+      if profile is not None:
+        profile.render_seconds += time.perf_counter() - started
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+class Instrumentation:
+  """Profiles every request; logs slow requests and N+1 patterns, and keeps per-endpoint totals.
+
+  Slow requests (SLOW_REQUEST_MS) and requests repeating one statement more
+  than N_PLUS_ONE_THRESHOLD times are logged as JSON lines, through
+  app.logger or, when SLOW_REQUEST_LOG names a file, to that file alone.
+  SERVER_TIMING adds a Server-Timing header for the
+  browser's network panel. Streamed bodies are measured only up to the
+  start of the stream.
+  """
+
+  def __init__(self):
+    self.endpoints = {}
+    self._lock = threading.Lock()
+    self.log = None
+
+  def init_app(self, app):
+    app.extensions['instrumentation'] = self
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+      return
+    self.slow_seconds = app.config.get('SLOW_REQUEST_MS', 500) / 1000
+    self.threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    self.server_timing = app.config.get('SERVER_TIMING', False)
+    app.jinja_env.template_class = TimedTemplate
+    self.log = app.logger
+    if app.config.get('SLOW_REQUEST_LOG'):
+      self.log = logging.getLogger('fyyur.requests')
+      path = os.path.abspath(app.config['SLOW_REQUEST_LOG'])
+      # create_app() may run more than once per process; the logger is process-wide
+      if not any(getattr(handler, 'baseFilename', None) == path for handler in self.log.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.log.addHandler(handler)
+      self.log.setLevel(logging.INFO)
+      self.log.propagate = False
+
+    @app.before_request
+    def start_profile():
+      g.profile = RequestProfile()
+
+    @app.after_request
+    def finish_profile(response):
+      profile = g.get('profile')
+      if profile is not None:
+        self.record(profile, response)
+      return response
+
+  def record(self, profile, response):
+    elapsed = time.perf_counter() - profile.started
+    repeated = profile.repeated(self.threshold)
+    endpoint = request.endpoint or 'unmatched'
+
+    with self._lock:
+      totals = self.endpoints.setdefault(endpoint, Counter())
+      totals['requests'] += 1
+      totals['statements'] += profile.statements
+      totals['rows'] += profile.rows
+      totals['db_seconds'] += profile.db_seconds
+      totals['render_seconds'] += profile.render_seconds
+      totals['seconds'] += elapsed
+      totals['slow'] += elapsed >= self.slow_seconds
+      totals['n_plus_one'] += bool(repeated)
+
+    if elapsed >= self.slow_seconds or repeated:
+      self.log.warning(json.dumps({
+        "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "method": request.method,
+        "path": request.full_path.rstrip('?'),
+        "endpoint": endpoint,
+        "status": response.status_code,
+        "ms": round(elapsed * 1000, 1),
+        "statements": profile.statements,
+        "db_ms": round(profile.db_seconds * 1000, 1),
+        "rows": profile.rows,
+        "render_ms": round(profile.render_seconds * 1000, 1),
+        "repeated": [{"count": count, "statement": statement[:300]} for statement, count in repeated]
+      }))
+
+    if self.server_timing:
+      response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.statements} queries"',
+        f'render;dur={profile.render_seconds * 1000:.1f}',
+        f'app;dur={elapsed * 1000:.1f}',
+      ])
+
+  def stats(self):
+    with self._lock:
+      return {endpoint: dict(totals) for endpoint, totals in self.endpoints.items()}
+
+
+instrumentation = Instrumentation()
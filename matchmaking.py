@@ -0,0 +1,398 @@
+import queue
+import time
+import numpy
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Integer, delete, func, insert, type_coerce
+from background import run_in_background
+from models import db, Venue, Artist, Show, Match
+from genres import mask_jaccard, shared_genres
+from bulk import copy_rows
+
+#----------------------------------------------------------------------------#
+# Matchmaking.
+#----------------------------------------------------------------------------#
+# Venues seeking talent are paired with artists seeking a venue. A pair
+# scores on its shared genres (Jaccard), on being in the same state and city,
+# and on the shows the two already played together. `flask matches rebuild`
+# keeps each venue's and each artist's MATCHES_PER_ENTITY best pairs in the
+# match table, scoring with NumPy only the pairs that can be among them;
+# editing a venue or an artist rescores its pairs in a background thread.
+
+DEFAULT_WEIGHTS = {'genres': 1.0, 'state': 0.2, 'city': 0.5, 'history': 0.3}
+
+# Groups of columns a row's best pairs are searched in: its city, its state, everywhere
+GROUPS = ('areas', 'states', None)
+
+CANDIDATES = {
+  'venue': (Venue, Venue.seeking_talent),
+  'artist': (Artist, Artist.seeking_venue),
+}
+
+
+class Candidates:
+  """One side's candidates (venues seeking talent, or artists seeking a venue) as arrays.
+
+  `areas` and `states` map (state, city) and state to codes shared by both
+  sides.
+  """
+
+  def __init__(self, rows, areas, states):
+    self.ids = numpy.array([row[0] for row in rows], dtype=numpy.int64)
+    self.masks = numpy.array([row[1] for row in rows], dtype=numpy.int64)
+    self.states = numpy.array([states.setdefault(row[2], len(states)) for row in rows], dtype=numpy.int64)
+    self.areas = numpy.array([areas.setdefault((row[2], row[3]), len(areas)) for row in rows], dtype=numpy.int64)
+    self.id_order = numpy.argsort(self.ids)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def groups(self, name):
+    """Group codes of the candidates: their `name` ('areas' or 'states'), or all in one group for None."""
+    return numpy.zeros(len(self), dtype=numpy.int64) if name is None else getattr(self, name)
+
+  def positions(self, ids):
+    """Positions of `ids` in the arrays; -1 for ids that are not candidates."""
+    if not len(self.ids):
+      return numpy.full(len(ids), -1)
+    sorted_ids = self.ids[self.id_order]
+    found = numpy.minimum(numpy.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return numpy.where(sorted_ids[found] == ids, self.id_order[found], -1)
+
+
+def load_candidates(kind, areas, states, criteria=()):
+  model, seeking = CANDIDATES[kind]
+  rows = db.session.query(
+    model.id,
+    type_coerce(model.genres, Integer),
+    model.state,
+    model.city
+  ).filter(
+    seeking.is_(True), *criteria
+  ).all()
+  return Candidates(rows, areas, states)
+
+
+def load_history(criteria=()):
+  """(venue ids, artist ids, show counts) of the pairs that have played together."""
+  rows = db.session.query(
+    Show.venue_id, Show.artist_id, func.count(Show.id)
+  ).filter(
+    *criteria
+  ).group_by(
+    Show.venue_id, Show.artist_id
+  ).all()
+  return tuple(numpy.array([row[column] for row in rows], dtype=numpy.int64) for column in range(3))
+
+
+class Scorer:
+  """Scores of pairs of `rows` and `columns` candidates, given by position.
+
+  `history` is (row ids, column ids, show counts).
+  """
+
+  def __init__(self, rows, columns, history, weights):
+    self.rows = rows
+    self.columns = columns
+    self.weights = weights
+    row_ids, column_ids, counts = history
+    row_positions, column_positions = rows.positions(row_ids), columns.positions(column_ids)
+    known = (row_positions >= 0) & (column_positions >= 0)
+    keys = self.keys(row_positions[known], column_positions[known])
+    order = numpy.argsort(keys)
+    self.history_rows = row_positions[known][order]
+    self.history_columns = column_positions[known][order]
+    self.history_counts = counts[known][order]
+    self.history_keys = keys[order]
+
+  def keys(self, row_positions, column_positions):
+    """One integer per pair, for deduplicating and looking pairs up."""
+    return row_positions * max(len(self.columns), 1) + column_positions
+
+  def shows(self, row_positions, column_positions):
+    """Shows each pair played together."""
+    if not len(self.history_keys):
+      return numpy.zeros(len(row_positions), dtype=numpy.int64)
+    keys = self.keys(row_positions, column_positions)
+    found = numpy.minimum(numpy.searchsorted(self.history_keys, keys), len(self.history_keys) - 1)
+    return numpy.where(self.history_keys[found] == keys, self.history_counts[found], 0)
+
+  def score(self, row_positions, column_positions):
+    rows, columns, weights = self.rows, self.columns, self.weights
+    scores = weights['genres'] * mask_jaccard(rows.masks[row_positions], columns.masks[column_positions])
+    scores += weights['state'] * (rows.states[row_positions] == columns.states[column_positions])
+    scores += weights['city'] * (rows.areas[row_positions] == columns.areas[column_positions])
+    scores += weights['history'] * numpy.log1p(self.shows(row_positions, column_positions))
+    return scores.astype(numpy.float32)
+
+  def details(self, row_positions, column_positions):
+    """(shared genres, same city, shows together) of the given pairs."""
+    rows, columns = self.rows, self.columns
+    shared = shared_genres(rows.masks[row_positions], columns.masks[column_positions])
+    same_city = rows.areas[row_positions] == columns.areas[column_positions]
+    return shared, same_city, self.shows(row_positions, column_positions)
+
+
+def ranges(starts, stops):
+  """(indices, lengths): the concatenated ranges starts[i]:stops[i]."""
+  lengths = stops - starts
+  offsets = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+  return numpy.arange(lengths.sum()) + offsets, lengths
+
+
+def nearest_in_groups(scorer, group, limit):
+  """(row positions, column positions): every row's `limit` most similar columns by genres within its `group`."""
+  rows, columns = scorer.rows, scorer.columns
+  if not len(rows) or not len(columns):
+    return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+  row_groups, column_groups = rows.groups(group), columns.groups(group)
+  # columns by group then mask; a run is the columns of one group sharing a mask
+  order = numpy.lexsort((columns.masks, column_groups))
+  sorted_groups, sorted_masks = column_groups[order], columns.masks[order]
+  boundaries = numpy.flatnonzero((numpy.diff(sorted_groups) != 0) | (numpy.diff(sorted_masks) != 0)) + 1
+  run_starts = numpy.concatenate([[0], boundaries]).astype(numpy.int64)
+  run_stops = numpy.concatenate([boundaries, [len(order)]]).astype(numpy.int64)
+  run_groups, run_masks, run_sizes = sorted_groups[run_starts], sorted_masks[run_starts], run_stops - run_starts
+
+  first_run = numpy.searchsorted(run_groups, row_groups, 'left')
+  last_run = numpy.searchsorted(run_groups, row_groups, 'right')
+  group_starts = run_starts[numpy.minimum(first_run, len(run_starts) - 1)]
+  group_stops = numpy.where(last_run > first_run, run_stops[last_run - 1], group_starts)
+
+  # rows whose group is small pair with every column of it
+  small = numpy.flatnonzero(group_stops - group_starts <= limit)
+  indices, lengths = ranges(group_starts[small], group_stops[small])
+  picked_rows, picked_columns = [numpy.repeat(small, lengths)], [order[indices]]
+
+  # the others are ranked once per distinct (group, mask)
+  large = numpy.flatnonzero(group_stops - group_starts > limit)
+  if not len(large):
+    return picked_rows[0], picked_columns[0]
+  keys, inverse = numpy.unique(numpy.stack([row_groups[large], rows.masks[large]]), axis=1, return_inverse=True)
+  inverse = inverse.ravel()
+  members = large[numpy.argsort(inverse, kind='stable')]
+  member_bounds = numpy.searchsorted(numpy.sort(inverse), numpy.arange(keys.shape[1] + 1))
+  for key, (_, mask) in enumerate(keys.T.tolist()):
+    key_rows = members[member_bounds[key]:member_bounds[key + 1]]
+    first, last = first_run[key_rows[0]], last_run[key_rows[0]]
+    ranked = first + numpy.argsort(-mask_jaccard(run_masks[first:last], mask), kind='stable')
+    taken = ranked[:numpy.searchsorted(numpy.cumsum(run_sizes[ranked]), limit) + 1]
+    chosen = order[ranges(run_starts[taken], run_stops[taken])[0][:limit]]
+    picked_rows.append(numpy.repeat(key_rows, len(chosen)))
+    picked_columns.append(numpy.tile(chosen, len(key_rows)))
+  return numpy.concatenate(picked_rows), numpy.concatenate(picked_columns)
+
+
+def best_pairs(scorer, limit):
+  """(row positions, column positions, scores) of every row's `limit` best positive pairs.
+
+  Within a row's city, within its state and everywhere, pairs without shows
+  together only differ by genres; with non-negative weights a row's best
+  pairs are therefore among the `limit` most similar by genres of each of
+  these groups, or among its show history. Only those are scored.
+  """
+  picked = [nearest_in_groups(scorer, group, limit) for group in GROUPS]
+  picked.append((scorer.history_rows, scorer.history_columns))
+  row_positions = numpy.concatenate([pair[0] for pair in picked])
+  column_positions = numpy.concatenate([pair[1] for pair in picked])
+  _, unique = numpy.unique(scorer.keys(row_positions, column_positions), return_index=True)
+  row_positions, column_positions = row_positions[unique], column_positions[unique]
+  scores = scorer.score(row_positions, column_positions)
+  kept = best_per_row(row_positions, scores, limit)
+  return row_positions[kept], column_positions[kept], scores[kept]
+
+
+def best_per_row(row_positions, scores, limit):
+  """Indices of every row's `limit` highest positive scores, by row then score."""
+  order = numpy.lexsort((-scores, row_positions))
+  rows = row_positions[order]
+  rank = numpy.arange(len(order)) - numpy.searchsorted(rows, rows)
+  return order[(rank < limit) & (scores[order] > 0)]
+
+
+def match_rows(kind, scorer, row_positions, column_positions, scores):
+  """Match table rows for pairs of a scorer whose rows are `kind` candidates."""
+  shared, same_city, shows = scorer.details(row_positions, column_positions)
+  own_ids = scorer.rows.ids[row_positions]
+  other_ids = scorer.columns.ids[column_positions]
+  venue_ids, artist_ids = (own_ids, other_ids) if kind == 'venue' else (other_ids, own_ids)
+  return [
+    {"venue_id": venue_id, "artist_id": artist_id, "score": score, "shared_genres": genres, "same_city": city, "shows": count}
+    for venue_id, artist_id, score, genres, city, count in zip(
+      venue_ids.tolist(), artist_ids.tolist(), scores.tolist(), shared.tolist(), same_city.tolist(), shows.tolist()
+    )
+  ]
+
+
+def score_matches(venues, artists, history, weights, limit):
+  """Match table rows of every venue's and every artist's `limit` best pairs.
+
+  `history` is (venue ids, artist ids, show counts).
+  """
+  venue_ids, artist_ids, counts = history
+  by_venue = Scorer(venues, artists, (venue_ids, artist_ids, counts), weights)
+  by_artist = Scorer(artists, venues, (artist_ids, venue_ids, counts), weights)
+  venue_positions, artist_positions, scores = best_pairs(by_venue, limit)
+  artist_side, venue_side, artist_scores = best_pairs(by_artist, limit)
+  # a pair can be among the best of both its venue and its artist
+  venue_positions = numpy.concatenate([venue_positions, venue_side])
+  artist_positions = numpy.concatenate([artist_positions, artist_side])
+  scores = numpy.concatenate([scores, artist_scores])
+  _, unique = numpy.unique(by_venue.keys(venue_positions, artist_positions), return_index=True)
+  return match_rows('venue', by_venue, venue_positions[unique], artist_positions[unique], scores[unique])
+
+
+def rebuild_matches(weights, limit):
+  """Rescore every pair and replace the match table; returns the number of matches kept."""
+  areas, states = {}, {}
+  venues = load_candidates('venue', areas, states)
+  artists = load_candidates('artist', areas, states)
+  rows = score_matches(venues, artists, load_history(), weights, limit)
+
+  db.session.execute(delete(Match))
+  if rows:
+    copy_rows(Match, rows)
+  db.session.commit()
+  return len(rows)
+
+
+def refresh_matches(kind, entity_id, weights, limit):
+  """Rescore one venue's or artist's pairs after it changed (or was deleted).
+
+  It keeps its own `limit` best pairs, plus any pair that beats the worst
+  match kept for the other side. Pairs the change pushed out of the other
+  side's lists are not backfilled until the next rebuild.
+  """
+  model = CANDIDATES[kind][0]
+  other_kind = 'artist' if kind == 'venue' else 'venue'
+  own_column, other_column = (Match.venue_id, Match.artist_id) if kind == 'venue' else (Match.artist_id, Match.venue_id)
+  history_column = Show.venue_id if kind == 'venue' else Show.artist_id
+
+  db.session.execute(delete(Match).where(own_column == entity_id))
+  areas, states = {}, {}
+  own = load_candidates(kind, areas, states, [model.id == entity_id])
+  others = load_candidates(other_kind, areas, states)
+  if len(own) and len(others):
+    venue_ids, artist_ids, counts = load_history([history_column == entity_id])
+    history = (venue_ids, artist_ids, counts) if kind == 'venue' else (artist_ids, venue_ids, counts)
+    scorer = Scorer(own, others, history, weights)
+    scores = scorer.score(numpy.zeros(len(others), dtype=numpy.int64), numpy.arange(len(others)))
+
+    depth = min(limit, len(others))
+    selected = numpy.zeros(len(others), dtype=bool)
+    selected[numpy.argpartition(-scores, depth - 1)[:depth]] = True
+    # the worst kept match of every other-side entity whose list is full
+    thresholds = numpy.full(len(others), -numpy.inf, dtype=numpy.float32)
+    kept = db.session.query(
+      other_column, func.count(), func.min(Match.score)
+    ).group_by(
+      other_column
+    ).having(
+      func.count() >= limit
+    ).all()
+    if kept:
+      positions = others.positions(numpy.array([row[0] for row in kept], dtype=numpy.int64))
+      known = positions >= 0
+      thresholds[positions[known]] = numpy.array([row[2] for row in kept], dtype=numpy.float32)[known]
+    selected |= scores > thresholds
+    selected &= scores > 0
+
+    column_positions = numpy.flatnonzero(selected)
+    rows = match_rows(kind, scorer, numpy.zeros(len(column_positions), dtype=numpy.int64), column_positions, scores[column_positions])
+    if rows:
+      db.session.execute(insert(Match), rows)
+  db.session.commit()
+
+
+def top_matches(kind, entity_id, limit):
+  """A venue's best artists, or an artist's best venues, from the match table."""
+  other = Artist if kind == 'venue' else Venue
+  own_column, other_column = (Match.venue_id, Match.artist_id) if kind == 'venue' else (Match.artist_id, Match.venue_id)
+  rows = db.session.query(
+    other.id,
+    other.name,
+    other.image_link,
+    other.city,
+    other.state,
+    Match.score,
+    Match.shared_genres,
+    Match.same_city,
+    Match.shows
+  ).join(
+    Match, other_column == other.id
+  ).filter(
+    own_column == entity_id
+  ).order_by(
+    Match.score.desc(), other.id
+  ).limit(limit).all()
+  return [dict(row._mapping) for row in rows]
+
+#----------------------------------------------------------------------------#
+# Matchmaker.
+#----------------------------------------------------------------------------#
+
+class Matchmaker:
+  """Holds the scoring settings and rescores edited venues and artists in a background thread."""
+
+  def __init__(self):
+    self.weights = dict(DEFAULT_WEIGHTS)
+    self.limit = 20
+    self.queue = None
+
+  def init_app(self, app):
+    app.extensions['matchmaker'] = self
+    self.weights = dict(DEFAULT_WEIGHTS, **app.config.get('MATCH_WEIGHTS', {}))
+    self.limit = app.config.get('MATCHES_PER_ENTITY', 20)
+    if not app.config.get('MATCH_REFRESH', True):
+      return
+    self.queue = queue.Queue()
+
+    def run():
+      while True:
+        changed = {self.queue.get()}
+        # edits queued meanwhile are rescored once
+        while not self.queue.empty():
+          changed.add(self.queue.get_nowait())
+        with app.app_context():
+          for kind, entity_id in changed:
+            try:
+              self.refresh(kind, entity_id)
+            except Exception:
+              db.session.rollback()
+              app.logger.exception('match refresh failed for %s %s', kind, entity_id)
+
+    run_in_background(app, 'matchmaking', run)
+
+  def changed(self, kind, entity_id):
+    """Queue a venue or artist whose genres, area, seeking flag or shows changed."""
+    if self.queue is not None:
+      self.queue.put((kind, entity_id))
+
+  def refresh(self, kind, entity_id):
+    refresh_matches(kind, entity_id, self.weights, self.limit)
+
+  def rebuild(self):
+    return rebuild_matches(self.weights, self.limit)
+
+  def top(self, kind, entity_id, limit=None):
+    return top_matches(kind, entity_id, limit or self.limit)
+
+
+matchmaker = Matchmaker()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('matches')
+def matches_command():
+  """Maintain the precomputed venue / artist matches."""
+
+
+@matches_command.command('rebuild')
+@with_appcontext
+def rebuild_command():
+  """Rescore every venue / artist pair; schedule it (e.g. nightly). `flask import` runs it after loading."""
+  started = time.perf_counter()
+  kept = matchmaker.rebuild()
+  click.echo(f'Kept {kept} matches in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,173 @@
+import bisect
+import threading
+import time
+from flask import g, request
+from cache import cache
+from pool_metrics import pool_metrics
+from routing import router
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HISTOGRAMS = (
+  ('request_duration_seconds', 'Time to serve a request, by endpoint.'),
+  ('request_db_seconds', 'Time a request spent in SQL statements, by endpoint.'),
+  ('request_render_seconds', 'Time a request spent rendering templates, by endpoint.'),
+)
+
+
+class ThreadSeries:
+  """One thread's share of the metrics. Only that thread writes it, so recording takes no lock."""
+
+  def __init__(self, size):
+    self.size = size
+    self.requests = {}
+    self.histograms = {}
+    self.in_flight = 0
+
+  def observe(self, name, endpoint, bucket, value):
+    # per bucket counts, then the +Inf count and the sum
+    histogram = self.histograms.get((name, endpoint))
+    if histogram is None:
+      histogram = self.histograms[(name, endpoint)] = [0] * (self.size + 2)
+    histogram[bucket] += 1
+    histogram[-1] += value
+
+
+class RequestMetrics:
+  """Request counts and latency histograms per endpoint, exposed in the Prometheus text format.
+
+  Every thread aggregates into its own ThreadSeries; /metrics sums them when
+  scraped. The lock is only taken the first time a thread records.
+  """
+
+  def __init__(self):
+    self.buckets = DEFAULT_BUCKETS
+    self.series = []
+    self._local = threading.local()
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    app.extensions['metrics'] = self
+    self.buckets = tuple(sorted(app.config.get('METRICS_BUCKETS', DEFAULT_BUCKETS)))
+    if not app.config.get('METRICS', True):
+      return
+
+    @app.before_request
+    def start_timer():
+      g.metrics_started = time.perf_counter()
+      self.thread_series().in_flight += 1
+
+    @app.after_request
+    def remember_status(response):
+      g.metrics_status = response.status_code
+      return response
+
+    # teardown also runs for requests that raised, which after_request does not see
+    @app.teardown_request
+    def observe_request(error):
+      started = g.pop('metrics_started', None)
+      if started is None:
+        return
+      series = self.thread_series()
+      series.in_flight -= 1
+      endpoint = request.endpoint or 'unmatched'
+      key = (endpoint, request.method, g.pop('metrics_status', 500))
+      series.requests[key] = series.requests.get(key, 0) + 1
+      self.observe(series, 'request_duration_seconds', endpoint, time.perf_counter() - started)
+      profile = g.get('profile')
+      if profile is not None:
+        self.observe(series, 'request_db_seconds', endpoint, profile.db_seconds)
+        self.observe(series, 'request_render_seconds', endpoint, profile.render_seconds)
+
+  def thread_series(self):
+    series = getattr(self._local, 'series', None)
+    if series is None:
+      series = self._local.series = ThreadSeries(len(self.buckets))
+      with self._lock:
+        self.series.append(series)
+    return series
+
+  def observe(self, series, name, endpoint, value):
+    series.observe(name, endpoint, bisect.bisect_left(self.buckets, value), value)
+
+  def collect(self):
+    """(request counts, histograms, requests in flight) summed over every thread."""
+    with self._lock:
+      all_series = list(self.series)
+    requests, histograms, in_flight = {}, {}, 0
+    for series in all_series:
+      in_flight += series.in_flight
+      # dict.copy is atomic, so a thread recording meanwhile cannot break the iteration
+      for key, count in series.requests.copy().items():
+        requests[key] = requests.get(key, 0) + count
+      for key, histogram in series.histograms.copy().items():
+        total = histograms.setdefault(key, [0] * len(histogram))
+        for index, value in enumerate(histogram):
+          total[index] += value
+    return requests, histograms, in_flight
+
+  def exposition(self):
+    """Every metric, in the Prometheus text exposition format (version 0.0.4)."""
+    requests, histograms, in_flight = self.collect()
+    lines = []
+
+    metric(lines, 'requests_total', 'counter', 'Requests served, by endpoint, method and status.', [
+      ({'endpoint': endpoint, 'method': method, 'status': status}, count)
+      for (endpoint, method, status), count in sorted(requests.items())
+    ])
+    metric(lines, 'requests_in_flight', 'gauge', 'Requests being served by this process.', [({}, in_flight)])
+
+    for name, description in HISTOGRAMS:
+      lines.append(f'# HELP fyyur_{name} {description}')
+      lines.append(f'# TYPE fyyur_{name} histogram')
+      for (histogram_name, endpoint), histogram in sorted(histograms.items()):
+        if histogram_name != name:
+          continue
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), histogram):
+          cumulative += count
+          lines.append(sample(f'{name}_bucket', {'endpoint': endpoint, 'le': bound}, cumulative))
+        lines.append(sample(f'{name}_count', {'endpoint': endpoint}, cumulative))
+        lines.append(sample(f'{name}_sum', {'endpoint': endpoint}, histogram[-1]))
+
+    cached = cache.stats()
+    metric(lines, 'cache_hits_total', 'counter', 'View cache hits.', [({}, cached['hits'])])
+    metric(lines, 'cache_misses_total', 'counter', 'View cache misses.', [({}, cached['misses'])])
+    metric(lines, 'cache_hit_ratio', 'gauge', 'View cache hits over lookups since start.', [({}, cached['hit_rate'])])
+    metric(lines, 'cache_entries', 'gauge', 'Entries in the view cache.', [({}, cached['entries'])])
+
+    pools = pool_metrics.stats()
+    for name, kind, description, field in (
+      ('db_pool_in_use', 'gauge', 'Connections checked out of the pool.', 'in_use'),
+      ('db_pool_idle', 'gauge', 'Connections idle in the pool.', 'idle'),
+      ('db_pool_overflow', 'gauge', 'Overflow connections open beyond pool_size.', 'overflow'),
+      ('db_pool_checkouts_total', 'counter', 'Connections checked out.', 'checkouts'),
+      ('db_pool_timeouts_total', 'counter', 'Checkouts that timed out waiting for a connection.', 'timeouts'),
+      ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection.', 'wait_seconds_total'),
+    ):
+      metric(lines, name, kind, description, [
+        ({'pool': label}, stats[field]) for label, stats in sorted(pools.items()) if stats[field] is not None
+      ])
+
+    metric(lines, 'db_routed_total', 'counter', 'Requests routed to the primary or a replica, by reason.', [
+      ({'route': route}, count) for route, count in sorted(router.stats()['routed'].items())
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def sample(name, labels, value):
+  label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+  return f'fyyur_{name}{{{label_text}}} {value}' if label_text else f'fyyur_{name} {value}'
+
+
+def metric(lines, name, kind, description, samples):
+  lines.append(f'# HELP fyyur_{name} {description}')
+  lines.append(f'# TYPE fyyur_{name} {kind}')
+  lines.extend(sample(name, labels, value) for labels, value in samples)
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,60 @@
+"""full-text search vectors
+
+Revision ID: 4d9b2e6c81a3
+Revises: e1a7f3c90b62
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9b2e6c81a3'
+down_revision = 'e1a7f3c90b62'
+branch_labels = None
+depends_on = None
+
+# venue and artist share the searched columns, so one trigger function serves both
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector :=
+    setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string(NEW.genres, ' '), '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(NEW.city, '') || ' ' || coalesce(NEW.state, '')), 'C');
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.execute(SEARCH_VECTOR_FUNCTION)
+
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(
+            f'CREATE TRIGGER {table}_search_vector_update '
+            f'BEFORE INSERT OR UPDATE OF name, genres, city, state ON {table} '
+            f'FOR EACH ROW EXECUTE FUNCTION search_vector_update()'
+        )
+        # fire the trigger once for the existing rows
+        op.execute(f'UPDATE {table} SET name = name')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_search_vector', 'venue', ['search_vector'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artist_search_vector', 'artist', ['search_vector'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_search_vector', table_name='artist', postgresql_concurrently=True)
+        op.drop_index('ix_venue_search_vector', table_name='venue', postgresql_concurrently=True)
+
+    for table in ('artist', 'venue'):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table}')
+        op.drop_column(table, 'search_vector')
+
+    op.execute('DROP FUNCTION IF EXISTS search_vector_update()')
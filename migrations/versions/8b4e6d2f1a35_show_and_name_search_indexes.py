@@ -0,0 +1,38 @@
+"""show and name search indexes
+
+Revision ID: 8b4e6d2f1a35
+Revises: 3f1c2a7b9d10
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d2f1a35'
+down_revision = '3f1c2a7b9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # Built concurrently so a populated show table stays writable meanwhile;
+    # CONCURRENTLY cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_show_start_time', 'show', ['start_time'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_name_trgm', table_name='artist', postgresql_concurrently=True)
+        op.drop_index('ix_venue_name_trgm', table_name='venue', postgresql_concurrently=True)
+        op.drop_index('ix_show_start_time', table_name='show', postgresql_concurrently=True)
+        op.drop_index('ix_show_artist_id_start_time', table_name='show', postgresql_concurrently=True)
+        op.drop_index('ix_show_venue_id_start_time', table_name='show', postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""similar venues / artists
+
+Revision ID: a4c7e2f9b318
+Revises: f3b8c1d5a920
+Create Date: 2026-10-18 18:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2f9b318'
+down_revision = 'f3b8c1d5a920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by `flask recommendations rebuild` and its background thread
+    for table in ('venue', 'artist'):
+        op.create_table(f'similar_{table}',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('similar_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('shared_genres', sa.Integer(), nullable=False),
+        sa.Column('shared_counterparts', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(f'{table}_id', 'similar_id')
+        )
+        op.create_index(f'ix_similar_{table}_{table}_id_score', f'similar_{table}', [f'{table}_id', 'score'], unique=False)
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_similar_{table}_{table}_id_score', table_name=f'similar_{table}')
+        op.drop_table(f'similar_{table}')
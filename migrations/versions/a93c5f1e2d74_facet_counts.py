@@ -0,0 +1,81 @@
+"""facet counts and genre indexes
+
+Revision ID: a93c5f1e2d74
+Revises: 4d9b2e6c81a3
+Create Date: 2026-10-18 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93c5f1e2d74'
+down_revision = '4d9b2e6c81a3'
+branch_labels = None
+depends_on = None
+
+# Moves one row out of its old (state, city, genre) cells and into its new ones.
+# Serves venue and artist alike; TG_TABLE_NAME is the facet_count entity.
+FACET_COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION facet_count_update() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND OLD.state = NEW.state AND OLD.city = NEW.city AND OLD.genres = NEW.genres THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE facet_count SET count = count - 1
+     WHERE entity = TG_TABLE_NAME AND state = OLD.state AND city = OLD.city
+       AND genre IN (SELECT '' UNION SELECT unnest(OLD.genres));
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO facet_count (entity, state, city, genre, count)
+    SELECT TG_TABLE_NAME, NEW.state, NEW.city, genre, 1
+      FROM (SELECT '' AS genre UNION SELECT unnest(NEW.genres)) AS genres
+    ON CONFLICT (entity, state, city, genre) DO UPDATE SET count = facet_count.count + 1;
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.create_table('facet_count',
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity', 'state', 'city', 'genre')
+    )
+    op.execute(FACET_COUNT_FUNCTION)
+
+    for table in ('venue', 'artist'):
+        op.execute(
+            f'CREATE TRIGGER {table}_facet_count_update '
+            f'AFTER INSERT OR DELETE OR UPDATE OF state, city, genres ON {table} '
+            f'FOR EACH ROW EXECUTE FUNCTION facet_count_update()'
+        )
+        op.execute(
+            f"INSERT INTO facet_count (entity, state, city, genre, count) "
+            f"SELECT '{table}', state, city, genre, count(*) "
+            f"FROM {table}, LATERAL (SELECT '' AS genre UNION SELECT unnest(genres)) AS genres "
+            f"GROUP BY state, city, genre"
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_genres', table_name='artist', postgresql_concurrently=True)
+        op.drop_index('ix_venue_genres', table_name='venue', postgresql_concurrently=True)
+
+    for table in ('artist', 'venue'):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_facet_count_update ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS facet_count_update()')
+    op.drop_table('facet_count')
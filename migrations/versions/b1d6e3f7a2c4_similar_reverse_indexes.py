@@ -0,0 +1,28 @@
+"""similar reverse indexes
+
+Revision ID: b1d6e3f7a2c4
+Revises: a4c7e2f9b318
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1d6e3f7a2c4'
+down_revision = 'a4c7e2f9b318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_similar_venue_similar_id', 'similar_venue', ['similar_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_similar_artist_similar_id', 'similar_artist', ['similar_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_similar_artist_similar_id', table_name='similar_artist', postgresql_concurrently=True)
+        op.drop_index('ix_similar_venue_similar_id', table_name='similar_venue', postgresql_concurrently=True)
@@ -0,0 +1,89 @@
+"""upcoming and past show counters
+
+Revision ID: b5e2d8a41c90
+Revises: a93c5f1e2d74
+Create Date: 2026-10-18 16:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2d8a41c90'
+down_revision = 'a93c5f1e2d74'
+branch_labels = None
+depends_on = None
+
+# Counts a written show on the upcoming or past side of the counter clock.
+# The roll-over takes a SHARE lock on show, so the clock cannot move between
+# this read and the commit of the show.
+SHOW_COUNTERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_counters_update() RETURNS trigger AS $$
+DECLARE
+  clock timestamp;
+BEGIN
+  SELECT rolled_over_at INTO clock FROM show_counter_clock WHERE id = 1;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE venue SET
+      upcoming_shows_count = upcoming_shows_count - (OLD.start_time > clock)::int,
+      past_shows_count = past_shows_count - (OLD.start_time <= clock)::int
+    WHERE id = OLD.venue_id;
+    UPDATE artist SET
+      upcoming_shows_count = upcoming_shows_count - (OLD.start_time > clock)::int,
+      past_shows_count = past_shows_count - (OLD.start_time <= clock)::int
+    WHERE id = OLD.artist_id;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE venue SET
+      upcoming_shows_count = upcoming_shows_count + (NEW.start_time > clock)::int,
+      past_shows_count = past_shows_count + (NEW.start_time <= clock)::int
+    WHERE id = NEW.venue_id;
+    UPDATE artist SET
+      upcoming_shows_count = upcoming_shows_count + (NEW.start_time > clock)::int,
+      past_shows_count = past_shows_count + (NEW.start_time <= clock)::int
+    WHERE id = NEW.artist_id;
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('show_counter_clock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # no show may be written between the backfill and the trigger going live
+    op.execute('LOCK TABLE show IN SHARE MODE')
+    op.execute('INSERT INTO show_counter_clock (id, rolled_over_at) VALUES (1, LOCALTIMESTAMP)')
+    op.execute(SHOW_COUNTERS_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER show_counters_update '
+        'AFTER INSERT OR DELETE OR UPDATE OF venue_id, artist_id, start_time ON show '
+        'FOR EACH ROW EXECUTE FUNCTION show_counters_update()'
+    )
+    for table in ('venue', 'artist'):
+        op.execute(
+            f'UPDATE {table} SET upcoming_shows_count = counts.upcoming, past_shows_count = counts.past '
+            f'FROM (SELECT {table}_id, '
+            f'count(*) FILTER (WHERE start_time > LOCALTIMESTAMP) AS upcoming, '
+            f'count(*) FILTER (WHERE start_time <= LOCALTIMESTAMP) AS past '
+            f'FROM show GROUP BY {table}_id) AS counts '
+            f'WHERE {table}.id = counts.{table}_id'
+        )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS show_counters_update ON show')
+    op.execute('DROP FUNCTION IF EXISTS show_counters_update()')
+    op.drop_table('show_counter_clock')
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
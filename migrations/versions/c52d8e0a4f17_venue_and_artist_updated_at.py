@@ -0,0 +1,32 @@
+"""venue and artist updated_at
+
+Revision ID: c52d8e0a4f17
+Revises: 8b4e6d2f1a35
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d8e0a4f17'
+down_revision = '8b4e6d2f1a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+    with op.batch_alter_table('artist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('artist', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('venue', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
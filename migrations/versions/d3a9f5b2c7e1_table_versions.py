@@ -0,0 +1,56 @@
+"""table versions
+
+Revision ID: d3a9f5b2c7e1
+Revises: b1d6e3f7a2c4
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9f5b2c7e1'
+down_revision = 'b1d6e3f7a2c4'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ('venue', 'artist', 'show')
+
+# Bumps the table's version once per writing transaction. The triggers are
+# deferred to commit, so the version row is the last lock a writer takes and
+# is held only while it commits.
+TABLE_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION table_version_bump() RETURNS trigger AS $$
+BEGIN
+  UPDATE table_version SET version = version + 1, txid = txid_current()
+  WHERE name = TG_TABLE_NAME AND txid IS DISTINCT FROM txid_current();
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.create_table('table_version',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('txid', sa.BigInteger(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute(TABLE_VERSION_FUNCTION)
+    for table in VERSIONED_TABLES:
+        op.execute(f"INSERT INTO table_version (name) VALUES ('{table}')")
+        op.execute(
+            f'CREATE CONSTRAINT TRIGGER table_version_bump '
+            f'AFTER INSERT OR UPDATE OR DELETE ON {table} '
+            f'DEFERRABLE INITIALLY DEFERRED '
+            f'FOR EACH ROW EXECUTE FUNCTION table_version_bump()'
+        )
+
+
+def downgrade():
+    for table in VERSIONED_TABLES:
+        op.execute(f'DROP TRIGGER IF EXISTS table_version_bump ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS table_version_bump()')
+    op.drop_table('table_version')
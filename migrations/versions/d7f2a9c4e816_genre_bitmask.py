@@ -0,0 +1,193 @@
+"""genre bitmask
+
+Revision ID: d7f2a9c4e816
+Revises: b5e2d8a41c90
+Create Date: 2026-10-18 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f2a9c4e816'
+down_revision = 'b5e2d8a41c90'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of enums.Genre as (bit, member name, label). Stored masks depend
+# on this order, which is why the enum only ever grows at the end.
+GENRES = (
+    (0, 'Alternative', 'Alternative'),
+    (1, 'Blues', 'Blues'),
+    (2, 'Classical', 'Classical'),
+    (3, 'Country', 'Country'),
+    (4, 'Electronic', 'Electronic'),
+    (5, 'Folk', 'Folk'),
+    (6, 'Funk', 'Funk'),
+    (7, 'HipHop', 'Hip-Hop'),
+    (8, 'HeavyMetal', 'Heavy Metal'),
+    (9, 'Instrumental', 'Instrumental'),
+    (10, 'Jazz', 'Jazz'),
+    (11, 'MusicalTheatre', 'Musical Theatre'),
+    (12, 'Pop', 'Pop'),
+    (13, 'Punk', 'Punk'),
+    (14, 'RandB', 'R&B'),
+    (15, 'Reggae', 'Reggae'),
+    (16, 'RocknRoll', 'Rock n Roll'),
+    (17, 'Soul', 'Soul'),
+    (18, 'Other', 'Other'),
+)
+OTHER_BIT = 18
+
+GENRE_TABLE = ', '.join(f"({bit}, '{name}', '{label}')" for bit, name, label in GENRES)
+
+# Member names of a mask, for the triggers below (search vector, facet counts)
+GENRE_NAMES_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION genre_names(mask integer) RETURNS text[] AS $$
+  SELECT coalesce(array_agg(name ORDER BY shift), '{{}}')
+    FROM (VALUES {GENRE_TABLE}) AS genre (shift, name, label)
+   WHERE mask & (1 << shift) <> 0
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector :=
+    setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('simple', array_to_string(genre_names(NEW.genre_mask), ' ')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(NEW.city, '') || ' ' || coalesce(NEW.state, '')), 'C');
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+FACET_COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION facet_count_update() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND OLD.state = NEW.state AND OLD.city = NEW.city AND OLD.genre_mask = NEW.genre_mask THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE facet_count SET count = count - 1
+     WHERE entity = TG_TABLE_NAME AND state = OLD.state AND city = OLD.city
+       AND genre IN (SELECT '' UNION SELECT unnest(genre_names(OLD.genre_mask)));
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO facet_count (entity, state, city, genre, count)
+    SELECT TG_TABLE_NAME, NEW.state, NEW.city, genre, 1
+      FROM (SELECT '' AS genre UNION SELECT unnest(genre_names(NEW.genre_mask))) AS genres
+    ON CONFLICT (entity, state, city, genre) DO UPDATE SET count = facet_count.count + 1;
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# The array-based functions of 4d9b2e6c81a3 and a93c5f1e2d74, restored on downgrade
+ARRAY_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector :=
+    setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string(NEW.genres, ' '), '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(NEW.city, '') || ' ' || coalesce(NEW.state, '')), 'C');
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+ARRAY_FACET_COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION facet_count_update() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND OLD.state = NEW.state AND OLD.city = NEW.city AND OLD.genres = NEW.genres THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE facet_count SET count = count - 1
+     WHERE entity = TG_TABLE_NAME AND state = OLD.state AND city = OLD.city
+       AND genre IN (SELECT '' UNION SELECT unnest(OLD.genres));
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO facet_count (entity, state, city, genre, count)
+    SELECT TG_TABLE_NAME, NEW.state, NEW.city, genre, 1
+      FROM (SELECT '' AS genre UNION SELECT unnest(NEW.genres)) AS genres
+    ON CONFLICT (entity, state, city, genre) DO UPDATE SET count = facet_count.count + 1;
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def drop_triggers(table):
+    op.execute(f'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table}')
+    op.execute(f'DROP TRIGGER IF EXISTS {table}_facet_count_update ON {table}')
+
+
+def create_triggers(table, genre_column):
+    op.execute(
+        f'CREATE TRIGGER {table}_search_vector_update '
+        f'BEFORE INSERT OR UPDATE OF name, {genre_column}, city, state ON {table} '
+        f'FOR EACH ROW EXECUTE FUNCTION search_vector_update()'
+    )
+    op.execute(
+        f'CREATE TRIGGER {table}_facet_count_update '
+        f'AFTER INSERT OR DELETE OR UPDATE OF state, city, {genre_column} ON {table} '
+        f'FOR EACH ROW EXECUTE FUNCTION facet_count_update()'
+    )
+
+
+def upgrade():
+    op.execute(GENRE_NAMES_FUNCTION)
+
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('genre_mask', sa.Integer(), nullable=False, server_default='0'))
+        op.alter_column(table, 'genre_mask', server_default=None)
+        # arrays hold member names, or labels ('Hip-Hop'); anything else is free text and becomes Other
+        op.execute(
+            f"UPDATE {table} SET genre_mask = ("
+            f"SELECT coalesce(bit_or(1 << coalesce(genre.shift, {OTHER_BIT})), 0) "
+            f"FROM unnest({table}.genres) AS value "
+            f"LEFT JOIN (VALUES {GENRE_TABLE}) AS genre (shift, name, label) ON value IN (genre.name, genre.label))"
+        )
+        # the triggers depend on the array column; dropping it drops its GIN index too
+        drop_triggers(table)
+        op.drop_column(table, 'genres')
+
+    op.execute(SEARCH_VECTOR_FUNCTION)
+    op.execute(FACET_COUNT_FUNCTION)
+    for table in ('venue', 'artist'):
+        create_triggers(table, 'genre_mask')
+        # free-text genres folded into Other change the counts and the vectors, so rebuild both
+        op.execute(f"DELETE FROM facet_count WHERE entity = '{table}'")
+        op.execute(
+            f"INSERT INTO facet_count (entity, state, city, genre, count) "
+            f"SELECT '{table}', state, city, genre, count(*) "
+            f"FROM {table}, LATERAL (SELECT '' AS genre UNION SELECT unnest(genre_names(genre_mask))) AS genres "
+            f"GROUP BY state, city, genre"
+        )
+        op.execute(f'UPDATE {table} SET name = name')
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        drop_triggers(table)
+        op.add_column(table, sa.Column('genres', postgresql.ARRAY(sa.String()), nullable=True))
+        op.execute(f'UPDATE {table} SET genres = genre_names(genre_mask)')
+        op.alter_column(table, 'genres', nullable=False)
+        op.drop_column(table, 'genre_mask')
+
+    op.execute(ARRAY_SEARCH_VECTOR_FUNCTION)
+    op.execute(ARRAY_FACET_COUNT_FUNCTION)
+    for table in ('artist', 'venue'):
+        create_triggers(table, 'genres')
+    op.execute('DROP FUNCTION IF EXISTS genre_names(integer)')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
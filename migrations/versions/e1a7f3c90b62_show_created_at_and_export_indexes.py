@@ -0,0 +1,36 @@
+"""show created_at and export indexes
+
+Revision ID: e1a7f3c90b62
+Revises: c52d8e0a4f17
+Create Date: 2026-10-18 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7f3c90b62'
+down_revision = 'c52d8e0a4f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('show', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_created_at', 'show', ['created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_venue_updated_at', 'venue', ['updated_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_artist_updated_at', 'artist', ['updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_updated_at', table_name='artist', postgresql_concurrently=True)
+        op.drop_index('ix_venue_updated_at', table_name='venue', postgresql_concurrently=True)
+        op.drop_index('ix_show_created_at', table_name='show', postgresql_concurrently=True)
+
+    with op.batch_alter_table('show', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
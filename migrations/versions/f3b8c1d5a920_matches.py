@@ -0,0 +1,39 @@
+"""venue / artist matches
+
+Revision ID: f3b8c1d5a920
+Revises: d7f2a9c4e816
+Create Date: 2026-10-18 17:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c1d5a920'
+down_revision = 'd7f2a9c4e816'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by `flask matches rebuild`
+    op.create_table('match',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('shared_genres', sa.Integer(), nullable=False),
+    sa.Column('same_city', sa.Boolean(), nullable=False),
+    sa.Column('shows', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'artist_id')
+    )
+    op.create_index('ix_match_venue_id_score', 'match', ['venue_id', 'score'], unique=False)
+    op.create_index('ix_match_artist_id_score', 'match', ['artist_id', 'score'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_match_artist_id_score', table_name='match')
+    op.drop_index('ix_match_venue_id_score', table_name='match')
+    op.drop_table('match')
@@ -4,15 +4,26 @@ from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import UniqueConstraint
 from sqlalchemy import CheckConstraint
-from datetime import date
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import load_only, lazyload
+from datetime import date, datetime
+from routing import RoutingSession
+from genres import GenreMask
 # from app import db
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
 class Venue(db.Model):
   __tablename__ = 'venue'
+  __table_args__ = (
+    # trigram index backing the ilike('%term%') name search
+    db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    db.Index('ix_venue_updated_at', 'updated_at'),
+    db.Index('ix_venue_search_vector', 'search_vector', postgresql_using='gin'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String, nullable=False)
@@ -23,10 +34,18 @@ class Venue(db.Model):
   image_link = db.Column(db.String(500), nullable=False)
   facebook_link = db.Column(db.String(120), nullable=False)
   website = db.Column(db.String(120), nullable=False)
-  genres = db.Column(db.ARRAY(db.String), nullable=False)
+  # a bitmask of enums.Genre (genres.py), read and written as a list of genre names
+  genres = db.Column('genre_mask', GenreMask, key='genres', nullable=False, default=0)
   seeking_description = db.Column(db.String, nullable=False)
   seeking_talent = db.Column(db.Boolean,nullable=False, default=False)
-  shows = db.relationship('Show', backref='venue', lazy="joined", cascade="all, delete")
+  # bumped on every write to the venue or its shows; drives the page ETags
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+  # name, genres, city and state for full-text search; maintained by a database trigger
+  search_vector = db.deferred(db.Column(TSVECTOR, info={'internal': True}))
+  # shows on either side of the last counter roll-over (counters.py); maintained by a trigger on show
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', info={'internal': True})
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', info={'internal': True})
+  shows = db.relationship('Show', backref='venue', lazy="select", cascade="all, delete")
 
   def __repr__(self):
     return f'<Venue ID: {self.id}, name: {self.name}, city: {self.city}, state: {self.state}, address: {self.address}, phone: {self.phone}, image_link: {self.image_link}, facebook_link: {self.facebook_link}, website: {self.website}, genres: {self.genres}, seeking_description: {self.seeking_description}, seeking_talent: {self.seeking_talent}, shows: {self.shows}>'
@@ -34,34 +53,206 @@ class Venue(db.Model):
 
 class Artist(db.Model):
   __tablename__ = 'artist'
+  __table_args__ = (
+    db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    db.Index('ix_artist_updated_at', 'updated_at'),
+    db.Index('ix_artist_search_vector', 'search_vector', postgresql_using='gin'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String,  nullable=False)
   city = db.Column(db.String(120), nullable=False)
   state = db.Column(db.String(120), nullable=False)
   phone = db.Column(db.String(120), nullable=False) #add some constrains 
-  genres = db.Column(db.ARRAY(db.String), nullable=False)
+  genres = db.Column('genre_mask', GenreMask, key='genres', nullable=False, default=0)
   image_link = db.Column(db.String(500), nullable=False)
   facebook_link = db.Column(db.String(120), nullable=False)
   website = db.Column(db.String(120), nullable=False)
   seeking_venue = db.Column(db.Boolean,nullable=False, default=False)
   seeking_description = db.Column(db.String, nullable=False)
-  shows = db.relationship('Show', backref='showlist', lazy="joined", cascade="all, delete")
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+  search_vector = db.deferred(db.Column(TSVECTOR, info={'internal': True}))
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', info={'internal': True})
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', info={'internal': True})
+  shows = db.relationship('Show', backref='showlist', lazy="select", cascade="all, delete")
   
   def __repr__(self):
     return f'<Artist ID: {self.id}, name: {self.name}, city: {self.city}, state: {self.state}, phone: {self.phone}, genres: {self.genres}, image_link: {self.image_link}, facebook_link: {self.facebook_link}, website: {self.website}, seeking_venue: {self.seeking_venue}, seeking_description: {self.seeking_description}, shows: {self.shows}>'
 
 class Show(db.Model):
   __tablename__ = 'show'
+  __table_args__ = (
+    # per-venue / per-artist "upcoming shows" lookups and the /shows keyset order
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_start_time', 'start_time'),
+    db.Index('ix_show_created_at', 'created_at'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   venue_id =  db.Column(db.Integer, db.ForeignKey('venue.id'),nullable=False)
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'),nullable=False)
   start_time = db.Column(db.DateTime, nullable=False, default=date.today())
+  # shows are never edited, so creation time is enough for incremental exports
+  created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
 
   def __repr__(self):
     return f'<Show ID: {self.id}, venue_id: {self.venue_id}, artist_id: {self.artist_id}, start_time: {self.start_time}'
 
+class TableVersion(db.Model):
+  """Change counter of the venue, artist and show tables, one row per table.
+
+  A trigger deferred to commit bumps it once per transaction writing the
+  table, so listing ETags read one row instead of aggregating the table.
+  """
+  __tablename__ = 'table_version'
+
+  name = db.Column(db.String, primary_key=True)
+  version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+  # the transaction that last bumped it
+  txid = db.Column(db.BigInteger)
+
+class ShowCounterClock(db.Model):
+  """Single row holding the time the venue and artist show counters are split at.
+
+  A show starting after `rolled_over_at` counts as upcoming, any other as
+  past; the roll-over command moves the clock forward.
+  """
+  __tablename__ = 'show_counter_clock'
+
+  id = db.Column(db.Integer, primary_key=True)
+  rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+  def __repr__(self):
+    return f'<ShowCounterClock rolled_over_at: {self.rolled_over_at}>'
+
+class FacetCount(db.Model):
+  """Venues or artists per (state, city, genre), maintained by a database trigger on every write.
+
+  The '' genre row counts each entity of the area once, whatever its genres.
+  """
+  __tablename__ = 'facet_count'
+
+  entity = db.Column(db.String(20), primary_key=True)
+  state = db.Column(db.String(120), primary_key=True)
+  city = db.Column(db.String(120), primary_key=True)
+  genre = db.Column(db.String(120), primary_key=True)
+  count = db.Column(db.Integer, nullable=False, default=0)
+
+  def __repr__(self):
+    return f'<FacetCount {self.entity} {self.state} {self.city} {self.genre}: {self.count}>'
+
+class Match(db.Model):
+  """A venue seeking talent paired with an artist seeking a venue, scored by matchmaking.py.
+
+  Holds the best MATCHES_PER_ENTITY pairs of every venue and of every artist.
+  """
+  __tablename__ = 'match'
+  __table_args__ = (
+    db.Index('ix_match_venue_id_score', 'venue_id', 'score'),
+    db.Index('ix_match_artist_id_score', 'artist_id', 'score'),
+  )
+
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+  artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+  score = db.Column(db.Float, nullable=False)
+  # why they match: genres in common, same city, shows already played together
+  shared_genres = db.Column(db.Integer, nullable=False)
+  same_city = db.Column(db.Boolean, nullable=False)
+  shows = db.Column(db.Integer, nullable=False)
+
+  def __repr__(self):
+    return f'<Match venue_id: {self.venue_id}, artist_id: {self.artist_id}, score: {self.score}>'
+
+class SimilarVenue(db.Model):
+  """A venue's neighbour by genres and artists in common, ranked by recommendations.py."""
+  __tablename__ = 'similar_venue'
+  __table_args__ = (
+    db.Index('ix_similar_venue_venue_id_score', 'venue_id', 'score'),
+    # the entities listing one as similar, whose pages show its name and image
+    db.Index('ix_similar_venue_similar_id', 'similar_id'),
+  )
+
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+  similar_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+  score = db.Column(db.Float, nullable=False)
+  shared_genres = db.Column(db.Integer, nullable=False)
+  # artists who played both venues
+  shared_counterparts = db.Column(db.Integer, nullable=False)
+  computed_at = db.Column(db.DateTime, nullable=False)
+
+  def __repr__(self):
+    return f'<SimilarVenue venue_id: {self.venue_id}, similar_id: {self.similar_id}, score: {self.score}>'
+
+class SimilarArtist(db.Model):
+  """An artist's neighbour by genres and venues in common, ranked by recommendations.py."""
+  __tablename__ = 'similar_artist'
+  __table_args__ = (
+    db.Index('ix_similar_artist_artist_id_score', 'artist_id', 'score'),
+    db.Index('ix_similar_artist_similar_id', 'similar_id'),
+  )
+
+  artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+  similar_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+  score = db.Column(db.Float, nullable=False)
+  shared_genres = db.Column(db.Integer, nullable=False)
+  # venues both artists played
+  shared_counterparts = db.Column(db.Integer, nullable=False)
+  computed_at = db.Column(db.DateTime, nullable=False)
+
+  def __repr__(self):
+    return f'<SimilarArtist artist_id: {self.artist_id}, similar_id: {self.similar_id}, score: {self.score}>'
+
+# ----------------------------------------------------------------------------#
+# Load profiles.
+# ----------------------------------------------------------------------------#
+# Relationships are lazy by default; each query picks the loading strategy
+# for the page it serves instead of every load dragging in the show history.
+
+LOAD_PROFILES = {
+  Venue: {
+    # listing pages only render the id and the name
+    'list': (load_only(Venue.id, Venue.name),),
+    # detail pages fetch bounded show windows separately (queries.entity_detail)
+    'detail': (lazyload(Venue.shows),),
+    # edit forms only touch the venue's own columns
+    'edit': (lazyload(Venue.shows),),
+  },
+  Artist: {
+    'list': (load_only(Artist.id, Artist.name),),
+    'detail': (lazyload(Artist.shows),),
+    'edit': (lazyload(Artist.shows),),
+  },
+}
+
+def public_columns(model):
+  """Names of the columns that describe the entity, leaving out internal ones like search vectors."""
+  return tuple(column.key for column in model.__table__.columns if not column.info.get('internal'))
+
+def load_profile(model, profile):
+  """Loader options for `model` under a named profile: 'list', 'detail' or 'edit'."""
+  return LOAD_PROFILES[model][profile]
+
+# SQLSTATEs of transactions Postgres aborts to break a deadlock or a serialization conflict
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+def commit_with_retry(write, attempts=3):
+  """Run `write()` and commit, starting over when Postgres aborts the transaction on a lock conflict.
+
+  Writers touch the show table before the venue and artist rows, in the
+  order of the counter rollover (counters.roll_over); the retry covers the
+  row lock cycles that remain between concurrent multi-row updates.
+  """
+  for attempt in range(attempts):
+    try:
+      result = write()
+      db.session.commit()
+      return result
+    except DBAPIError as error:
+      db.session.rollback()
+      if attempt == attempts - 1 or getattr(error.orig, 'pgcode', None) not in RETRYABLE_SQLSTATES:
+        raise
+
 # locations = db.Table('locations',
 #     db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), primary_key=True),
 #     db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True)
@@ -0,0 +1,103 @@
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Pool telemetry.
+#----------------------------------------------------------------------------#
+
+class PoolCounters:
+  def __init__(self):
+    self.checkouts = 0
+    self.wait_seconds = 0.0
+    self.max_wait_seconds = 0.0
+    self.overflow_checkouts = 0
+    self.timeouts = 0
+
+
+class PoolMetrics:
+  """Checkout wait, overflow and timeout counters of this process's connection pools, per bind."""
+
+  def __init__(self):
+    self.engines = {}
+    self.counters = {}
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    """Route the app's engines through MeteredQueuePool; call before db.init_app(app)."""
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if 'pool_size' in options:
+      options.setdefault('poolclass', MeteredQueuePool)
+    app.extensions['pool_metrics'] = self
+
+  def watch(self, engines):
+    """Name the pools of Flask-SQLAlchemy's engines after their bind ('primary' for the default one)."""
+    for key, engine in engines.items():
+      label = key or 'primary'
+      engine.pool.label = label
+      with self._lock:
+        self.engines[label] = engine
+
+  def record(self, pool, waited, overflowed=False, timed_out=False):
+    label = getattr(pool, 'label', 'primary')
+    with self._lock:
+      counters = self.counters.setdefault(label, PoolCounters())
+      if timed_out:
+        counters.timeouts += 1
+        return
+      counters.checkouts += 1
+      counters.wait_seconds += waited
+      counters.max_wait_seconds = max(counters.max_wait_seconds, waited)
+      if overflowed:
+        counters.overflow_checkouts += 1
+
+  def stats(self):
+    with self._lock:
+      return {
+        label: self._pool_stats(engine.pool, self.counters.get(label, PoolCounters()))
+        for label, engine in self.engines.items()
+      }
+
+  def _pool_stats(self, pool, counters):
+    metered = isinstance(pool, QueuePool)
+    return {
+      "pool_size": pool.size() if metered else None,
+      "in_use": pool.checkedout() if metered else None,
+      "idle": pool.checkedin() if metered else None,
+      "overflow": max(pool.overflow(), 0) if metered else None,
+      "max_overflow": pool._max_overflow if metered else None,
+      "checkouts": counters.checkouts,
+      "overflow_checkouts": counters.overflow_checkouts,
+      "timeouts": counters.timeouts,
+      "wait_seconds_total": counters.wait_seconds,
+      "wait_seconds_max": counters.max_wait_seconds,
+      "wait_seconds_avg": counters.wait_seconds / counters.checkouts if counters.checkouts else 0.0
+    }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+  """QueuePool timing every checkout: the wait for a free connection, or for a new one to open."""
+
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      connection = super()._do_get()
+    except exc.TimeoutError:
+      pool_metrics.record(self, time.perf_counter() - started, timed_out=True)
+      raise
+    # a connection checked out beyond pool_size is an overflow connection
+    pool_metrics.record(self, time.perf_counter() - started, overflowed=self.checkedout() > self.size())
+    return connection
+
+  def recreate(self):
+    pool = super().recreate()
+    pool.label = getattr(self, 'label', 'primary')
+    return pool
+
+
+class MeteredAsyncAdaptedQueuePool(MeteredQueuePool, AsyncAdaptedQueuePool):
+  """MeteredQueuePool for asyncio engines (async_reads)."""
@@ -0,0 +1,360 @@
+from itertools import groupby
+from operator import attrgetter
+from datetime import datetime
+from sqlalchemy import Integer, func, select, tuple_, type_coerce, update
+from models import db, Venue, Artist, Show, ShowCounterClock, TableVersion, SimilarVenue, SimilarArtist
+from genres import GenreMatrix
+
+#----------------------------------------------------------------------------#
+# Payload builders.
+#----------------------------------------------------------------------------#
+
+def area_index():
+  """Every (state, city) pair that has at least one venue, in listing order."""
+  rows = db.session.query(Venue.state, Venue.city).distinct().order_by(Venue.state, Venue.city)
+  return [(row.state, row.city) for row in rows]
+
+
+VENUE_AREA_FIELDS = ('id', 'name', 'num_upcoming_shows')
+
+
+def venue_areas(areas=None, fields=VENUE_AREA_FIELDS, yield_per=None, criteria=()):
+  """Build the area -> venues -> num_upcoming_shows tree for the /venues page.
+
+  Everything comes from a single statement over the venue table (upcoming
+  shows are the venue's counter); rows arrive ordered by area so the tree is
+  assembled in one pass without holding more than one area in flight.
+
+  `areas` optionally restricts the tree to those (state, city) pairs,
+  `criteria` to the venues matching extra filters (facets.facet_criteria),
+  `fields` trims the per-venue keys (and the SELECT list) and `yield_per`
+  streams the rows from a server-side cursor.
+  """
+  fields = ('id',) + tuple(field for field in fields if field != 'id')
+  columns = [Venue.state, Venue.city, Venue.id]
+  if 'name' in fields:
+    columns.append(Venue.name)
+  if 'num_upcoming_shows' in fields:
+    columns.append(Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+  rows = db.session.query(*columns)
+  if areas is not None:
+    rows = rows.filter(tuple_(Venue.state, Venue.city).in_(areas))
+  rows = rows.filter(*criteria)
+  rows = rows.order_by(
+    Venue.state, Venue.city, Venue.id
+  )
+  if yield_per:
+    rows = rows.execution_options(yield_per=yield_per)
+
+  for (state, city), area_rows in groupby(rows, key=attrgetter('state', 'city')):
+    yield {
+      "city": city,
+      "state": state,
+      "venues": [{field: row._mapping[field] for field in fields} for row in area_rows]
+    }
+
+
+# Columns a show row can be projected onto, and the table each one needs joined
+SHOW_FIELDS = {
+  'id': (Show.id, None),
+  'start_time': (Show.start_time, None),
+  'venue_id': (Show.venue_id, None),
+  'artist_id': (Show.artist_id, None),
+  'venue_name': (Venue.name.label('venue_name'), Venue),
+  'artist_name': (Artist.name.label('artist_name'), Artist),
+  'artist_image_link': (Artist.image_link.label('artist_image_link'), Artist),
+}
+
+
+def show_query(fields=tuple(SHOW_FIELDS)):
+  """Show projection onto `fields`, joining Venue / Artist only when a field needs them."""
+  # the projection may not name the show table first, so anchor the joins on it
+  query = db.session.query(*[SHOW_FIELDS[field][0] for field in fields]).select_from(Show)
+  joined = {SHOW_FIELDS[field][1] for field in fields}
+  if Venue in joined:
+    query = query.join(Venue, Venue.id == Show.venue_id)
+  if Artist in joined:
+    query = query.join(Artist, Artist.id == Show.artist_id)
+  return query
+
+
+def show_page(start=None, after=None, limit=60):
+  """One page of the /shows listing, keyset-paginated on (start_time, id).
+
+  `start` optionally bounds the window to shows starting at or after it and
+  `after` is the (start_time, id) of the last row of the previous page, so
+  every page is a single index range scan no matter how deep it is.
+  Returns the rows and the cursor of the next page (None on the last page).
+  """
+  query = show_query()
+
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if after is not None:
+    query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+
+  rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = (rows[-1].start_time, rows[-1].id)
+
+  return rows, next_cursor
+
+
+def show_stream(fields, start=None, yield_per=1000):
+  """Every show (optionally from `start` on) as dicts of `fields`, read through a server-side cursor."""
+  query = show_query(fields)
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  rows = query.order_by(Show.start_time, Show.id).execution_options(yield_per=yield_per)
+  for row in rows:
+    yield dict(row._mapping)
+
+
+def encode_cursor(cursor):
+  start_time, show_id = cursor
+  return f'{start_time.isoformat()},{show_id}'
+
+
+def decode_cursor(value):
+  """Parse an `after` cursor; raises ValueError on malformed input."""
+  start_time, show_id = value.rsplit(',', 1)
+  return datetime.fromisoformat(start_time), int(show_id)
+
+
+# For each detail page: the show column pointing at the entity, and the
+# model/column/key prefix of the other side of the show.
+SHOW_COUNTERPARTS = {
+  'venue': (Show.venue_id, Artist, Show.artist_id, 'artist'),
+  'artist': (Show.artist_id, Venue, Show.venue_id, 'venue'),
+}
+
+
+def entity_shows_statement(kind, entity_id, now, upcoming, before=None, limit=12):
+  """SELECT of a bounded window of one venue's or artist's shows joined with the other side.
+
+  Upcoming shows come soonest first; past shows come most recent first and
+  `before` is the (start_time, id) cursor of the last past show already shown.
+  One row beyond `limit` is fetched to tell whether another window follows.
+  """
+  fk_column, counterpart, counterpart_fk, prefix = SHOW_COUNTERPARTS[kind]
+  statement = select(
+    Show.id,
+    Show.start_time,
+    counterpart.id.label('counterpart_id'),
+    counterpart.name.label('counterpart_name'),
+    counterpart.image_link.label('counterpart_image_link')
+  ).join(
+    counterpart, counterpart.id == counterpart_fk
+  ).where(
+    fk_column == entity_id
+  )
+
+  if upcoming:
+    statement = statement.where(Show.start_time > now).order_by(Show.start_time, Show.id)
+  else:
+    statement = statement.where(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc())
+    if before is not None:
+      statement = statement.where(tuple_(Show.start_time, Show.id) < tuple_(*before))
+
+  return statement.limit(limit + 1)
+
+
+def entity_shows_window(kind, rows, limit):
+  """Shape the rows of entity_shows_statement into show dicts and the cursor of the next window (None if exhausted)."""
+  prefix = SHOW_COUNTERPARTS[kind][3]
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = (rows[-1].start_time, rows[-1].id)
+
+  shows = [{
+    prefix + '_id': row.counterpart_id,
+    prefix + '_name': row.counterpart_name,
+    prefix + '_image_link': row.counterpart_image_link,
+    'start_time': row.start_time
+  } for row in rows]
+
+  return shows, next_cursor
+
+
+def entity_shows(kind, entity_id, now, upcoming, before=None, limit=12):
+  """A bounded window of one venue's or artist's shows, as (show dicts, next cursor)."""
+  rows = db.session.execute(entity_shows_statement(kind, entity_id, now, upcoming, before, limit)).all()
+  return entity_shows_window(kind, rows, limit)
+
+
+# For each detail page: its "you may also like" table, the column holding the entity, and the model listed
+SIMILAR_TABLES = {
+  'venue': (SimilarVenue, SimilarVenue.venue_id, Venue),
+  'artist': (SimilarArtist, SimilarArtist.artist_id, Artist),
+}
+
+
+# Columns of a venue or artist rendered on other detail pages: those of the
+# entities it has shows with, and those of the entities listing it as similar
+SHOWN_ON_COUNTERPARTS = ('name', 'image_link')
+SHOWN_ON_NEIGHBOURS = ('name', 'image_link', 'city', 'state')
+
+
+def touch_referrers(kind, entity_id, changed):
+  """Bump updated_at of the detail pages rendering the `changed` columns of a venue or artist.
+
+  Returns the ids of the bumped counterparts (the other kind) and neighbours
+  (the same kind), for the cache invalidation.
+  """
+  fk_column, counterpart, counterpart_fk, _ = SHOW_COUNTERPARTS[kind]
+  table, entity_column, model = SIMILAR_TABLES[kind]
+  now = datetime.now()
+  touched = []
+  for target, referrers, shown in (
+    (counterpart, select(counterpart_fk).where(fk_column == entity_id), SHOWN_ON_COUNTERPARTS),
+    (model, select(entity_column).where(table.similar_id == entity_id), SHOWN_ON_NEIGHBOURS),
+  ):
+    ids = []
+    if set(changed) & set(shown):
+      ids = [row.id for row in db.session.execute(
+        update(target).where(target.id.in_(referrers)).values(updated_at=now).returning(target.id),
+        execution_options={'synchronize_session': False}
+      )]
+    touched.append(ids)
+  return tuple(touched)
+
+
+def similar_statement(kind, entity_id, limit=6):
+  """SELECT of a venue's or artist's precomputed neighbours, best first; one range scan of the (entity, score) index."""
+  table, entity_column, model = SIMILAR_TABLES[kind]
+  return select(
+    model.id,
+    model.name,
+    model.image_link,
+    model.city,
+    model.state,
+    table.shared_genres,
+    table.shared_counterparts
+  ).join(
+    model, model.id == table.similar_id
+  ).where(
+    entity_column == entity_id
+  ).order_by(
+    table.score.desc(), model.id
+  ).limit(limit)
+
+
+def similar_entities(kind, entity_id, limit=6):
+  """A venue's or artist's precomputed neighbours, as dicts."""
+  return [dict(row._mapping) for row in db.session.execute(similar_statement(kind, entity_id, limit))]
+
+
+def detail_payload(entity, upcoming_window, past_window, similar=()):
+  """Detail page payload from the entity, its two show windows and its neighbours."""
+  # object class to dict, without the ORM's instance state so the payload can be cached;
+  # upcoming_shows_count and past_shows_count are the entity's own counters
+  data = {key: value for key, value in vars(entity).items() if not key.startswith('_')}
+
+  upcoming_shows, _ = upcoming_window
+  past_shows, next_past = past_window
+  data['past_shows'] = past_shows
+  data['upcoming_shows'] = upcoming_shows
+  data['past_shows_cursor'] = encode_cursor(next_past) if next_past else None
+  data['similar'] = list(similar)
+
+  return data
+
+
+def entity_detail(kind, entity, now, past_before=None, upcoming_limit=30, past_limit=12, similar_limit=6):
+  """Detail page payload: the entity's columns, both show counts, bounded show windows and its neighbours."""
+  return detail_payload(
+    entity,
+    entity_shows(kind, entity.id, now, True, limit=upcoming_limit),
+    entity_shows(kind, entity.id, now, False, before=past_before, limit=past_limit),
+    similar_entities(kind, entity.id, similar_limit)
+  )
+
+
+#----------------------------------------------------------------------------#
+# Page versions (ETag inputs).
+#----------------------------------------------------------------------------#
+
+def counter_clock():
+  """ShowCounterClock.rolled_over_at as a scalar subquery; the show counters change when it moves."""
+  return db.session.query(ShowCounterClock.rolled_over_at).filter(ShowCounterClock.id == 1).scalar_subquery()
+
+
+def entity_version(kind, entity_id, now):
+  """(updated_at, next upcoming start_time, neighbours' computed_at, counter clock) of a venue or artist, or None if it does not exist.
+
+  The next start time changes the moment a show moves from upcoming to
+  past, the neighbours when the recommendations are rebuilt and the clock
+  when the counters roll over, all changing the page without any write to
+  the entity.
+  """
+  model = Venue if kind == 'venue' else Artist
+  fk_column = SHOW_COUNTERPARTS[kind][0]
+  next_show = db.session.query(
+    func.min(Show.start_time)
+  ).filter(
+    fk_column == entity_id, Show.start_time > now
+  ).scalar_subquery()
+  table, entity_column, _ = SIMILAR_TABLES[kind]
+  neighbours = db.session.query(
+    func.max(table.computed_at)
+  ).filter(
+    entity_column == entity_id
+  ).scalar_subquery()
+
+  row = db.session.query(model.updated_at, next_show, neighbours, counter_clock()).filter(model.id == entity_id).first()
+  return None if row is None else tuple(row)
+
+
+def table_versions(*models):
+  """TableVersion.version of each model's table, as scalar subqueries (primary key lookups)."""
+  return [
+    db.session.query(TableVersion.version).filter(TableVersion.name == model.__tablename__).scalar_subquery()
+    for model in models
+  ]
+
+
+def table_version(model, now):
+  """(table version, counter clock, next upcoming start_time) of the venue or artist table.
+
+  As in entity_version, the next start time moves the moment a show
+  starts, before the counters roll over.
+  """
+  next_show = db.session.query(func.min(Show.start_time)).filter(Show.start_time > now).scalar_subquery()
+  return tuple(db.session.query(*table_versions(model), counter_clock(), next_show).one())
+
+
+def show_list_version():
+  """Version of the /shows pages: the show table's, and the venue and artist tables' for the names shown with them."""
+  return tuple(db.session.query(*table_versions(Show, Venue, Artist)).one())
+
+
+def entity_stream(model, fields, yield_per=1000, criteria=()):
+  """Rows of the venue or artist table as dicts of `fields`, read through a server-side cursor."""
+  rows = db.session.query(
+    *[getattr(model, field) for field in fields]
+  ).filter(
+    *criteria
+  ).order_by(
+    model.id
+  ).execution_options(yield_per=yield_per)
+  for row in rows:
+    yield dict(row._mapping)
+
+
+def genre_matrix(model, criteria=()):
+  """GenreMatrix of the venues or artists matching `criteria`, from one query over ids and raw genre masks."""
+  rows = db.session.query(
+    model.id,
+    type_coerce(model.genres, Integer)
+  ).filter(
+    *criteria
+  ).order_by(
+    model.id
+  ).all()
+  return GenreMatrix([row[0] for row in rows], [row[1] for row in rows])
+
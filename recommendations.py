@@ -0,0 +1,203 @@
+import time
+from datetime import datetime, timedelta
+import click
+import numpy
+from scipy import sparse
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, text
+from background import run_in_background
+from models import db, Venue, Artist
+from genres import mask_jaccard, shared_genres
+from queries import SIMILAR_TABLES, genre_matrix
+from matchmaking import best_per_row, load_history
+from bulk import copy_rows
+
+#----------------------------------------------------------------------------#
+# Similar venues and artists.
+#----------------------------------------------------------------------------#
+# Every venue's and every artist's SIMILAR_PER_ENTITY nearest neighbours of
+# the same kind, for the "you may also like" block of the detail pages. A
+# pair scores on its genres (Jaccard) and on its counterparts in common,
+# i.e. artists who played the same venues and venues that hosted the same
+# artists (cosine of their rows of the show incidence matrix, all pairs from
+# one sparse matrix product). The lists are rebuilt in batch, by `flask
+# recommendations rebuild` and every SIMILAR_REBUILD_SECONDS in the
+# background; the pages read them with one indexed lookup.
+
+DEFAULT_WEIGHTS = {'genres': 1.0, 'counterparts': 1.0}
+
+# Position of each kind's ids in matchmaking.load_history's (venue ids, artist ids, counts)
+HISTORY_SIDES = {
+  'venue': 0,
+  'artist': 1,
+}
+
+MODELS = {
+  'venue': Venue,
+  'artist': Artist,
+}
+
+
+def co_occurrence(matrix, entity_ids, counterpart_ids):
+  """(row positions, other row positions, counterparts in common, cosine) of the pairs of `matrix` rows sharing a counterpart.
+
+  `entity_ids` and `counterpart_ids` are the distinct pairs that played
+  together. A counterpart shared by n entities yields n² pairs, so this is
+  the expensive part for very popular venues.
+  """
+  empty = numpy.zeros(0, dtype=numpy.int64)
+  if not len(matrix) or not len(entity_ids):
+    return empty, empty, empty, numpy.zeros(0)
+  positions = numpy.minimum(numpy.searchsorted(matrix.ids, entity_ids), len(matrix) - 1)
+  known = matrix.ids[positions] == entity_ids
+  _, columns = numpy.unique(counterpart_ids[known], return_inverse=True)
+  incidence = sparse.csr_matrix(
+    (numpy.ones(known.sum(), dtype=numpy.float32), (positions[known], columns.ravel())),
+    shape=(len(matrix), int(columns.max(initial=-1)) + 1)
+  )
+
+  shared = (incidence @ incidence.T).tocoo()
+  off_diagonal = shared.row != shared.col
+  rows, others = shared.row[off_diagonal].astype(numpy.int64), shared.col[off_diagonal].astype(numpy.int64)
+  counts = shared.data[off_diagonal]
+  degrees = numpy.asarray(incidence.sum(axis=1)).ravel()
+  return rows, others, counts.astype(numpy.int64), counts / numpy.sqrt(degrees[rows] * degrees[others])
+
+
+def nearest_neighbours(matrix, entity_ids, counterpart_ids, weights, limit):
+  """(row positions, neighbour positions, scores, shared genres, counterparts in common) of every row's `limit` best neighbours.
+
+  Pairs without counterparts in common only differ by genres, so a row's
+  best neighbours are among its `limit` nearest by genres or among the
+  rows it shares a counterpart with; only those pairs are scored.
+  """
+  genre_rows, genre_others = matrix.nearest(limit)
+  shared_rows, shared_others, counts, cosine = co_occurrence(matrix, entity_ids, counterpart_ids)
+
+  width = max(len(matrix), 1)
+  keys, inverse = numpy.unique(
+    numpy.concatenate([genre_rows * width + genre_others, shared_rows * width + shared_others]), return_inverse=True
+  )
+  padding = numpy.zeros(len(genre_rows))
+  cosine = numpy.bincount(inverse, weights=numpy.concatenate([padding, cosine]), minlength=len(keys))
+  counts = numpy.bincount(inverse, weights=numpy.concatenate([padding, counts]), minlength=len(keys)).astype(numpy.int64)
+  rows, others = keys // width, keys % width
+
+  masks, other_masks = matrix.masks[rows], matrix.masks[others]
+  scores = weights['genres'] * mask_jaccard(masks, other_masks) + weights['counterparts'] * cosine
+  kept = best_per_row(rows, scores, limit)
+  return rows[kept], others[kept], scores[kept], shared_genres(masks[kept], other_masks[kept]), counts[kept]
+
+
+def similar_rows(kind, weights, limit, computed_at):
+  """Rows of the kind's neighbour table, for every venue or artist."""
+  side = HISTORY_SIDES[kind]
+  matrix = genre_matrix(MODELS[kind])
+  history = load_history()
+  rows, others, scores, genres, counterparts = nearest_neighbours(
+    matrix, history[side], history[1 - side], weights, limit
+  )
+  return [
+    {f'{kind}_id': entity_id, 'similar_id': similar_id, 'score': score,
+     'shared_genres': genre_count, 'shared_counterparts': counterpart_count, 'computed_at': computed_at}
+    for entity_id, similar_id, score, genre_count, counterpart_count in zip(
+      matrix.ids[rows].tolist(), matrix.ids[others].tolist(), scores.tolist(), genres.tolist(), counterparts.tolist()
+    )
+  ]
+
+
+def computed_at(kind):
+  """When the kind's neighbour table was last rebuilt, or None if it is empty."""
+  table = SIMILAR_TABLES[kind][0]
+  return db.session.query(func.max(table.computed_at)).scalar()
+
+
+def rebuild_similar(kind, weights, limit):
+  """Recompute and replace the neighbour table of venues or artists; returns the number of rows, or None if skipped.
+
+  Concurrent rebuilds (one per process) queue on the table lock, and one
+  that finds the table rebuilt since it started keeps that result.
+  """
+  started = datetime.now()
+  rows = similar_rows(kind, weights, limit, started)
+  table = SIMILAR_TABLES[kind][0]
+  db.session.execute(text(f'LOCK TABLE {table.__tablename__} IN EXCLUSIVE MODE'))
+  latest = computed_at(kind)
+  if latest is not None and latest > started:
+    db.session.rollback()
+    return None
+  db.session.execute(delete(table))
+  if rows:
+    copy_rows(table, rows)
+  db.session.commit()
+  return len(rows)
+
+#----------------------------------------------------------------------------#
+# Recommendations.
+#----------------------------------------------------------------------------#
+
+class Recommendations:
+  """Holds the scoring settings and rebuilds the neighbour tables in a background thread.
+
+  Every serving process runs the thread, but one finding a table younger than
+  SIMILAR_REBUILD_SECONDS leaves it alone, so a deployment rebuilds about
+  once per interval.
+  """
+
+  def __init__(self):
+    self.weights = dict(DEFAULT_WEIGHTS)
+    self.limit = 6
+
+  def init_app(self, app):
+    app.extensions['recommendations'] = self
+    self.weights = dict(DEFAULT_WEIGHTS, **app.config.get('SIMILAR_WEIGHTS', {}))
+    self.limit = app.config.get('SIMILAR_PER_ENTITY', 6)
+    interval = app.config.get('SIMILAR_REBUILD_SECONDS', 3600)
+    if not app.config.get('SIMILAR_REBUILD', True) or not interval:
+      return
+
+    def run():
+      while True:
+        for kind in MODELS:
+          with app.app_context():
+            try:
+              latest = computed_at(kind)
+              if latest is None or datetime.now() - latest >= timedelta(seconds=interval):
+                started = time.perf_counter()
+                kept = self.rebuild(kind)
+                if kept is not None:
+                  app.logger.info('similar %ss: %d rows in %.1fs', kind, kept, time.perf_counter() - started)
+            except Exception:
+              db.session.rollback()
+              app.logger.exception('similar %ss rebuild failed', kind)
+        time.sleep(interval)
+
+    run_in_background(app, 'recommendations', run)
+
+  def rebuild(self, kind):
+    return rebuild_similar(kind, self.weights, self.limit)
+
+
+recommendations = Recommendations()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('recommendations')
+def recommendations_command():
+  """Maintain the precomputed similar venues / artists."""
+
+
+@recommendations_command.command('rebuild')
+@click.option('--kind', type=click.Choice(list(MODELS)), multiple=True, help='Only rebuild these (default: both).')
+@with_appcontext
+def rebuild_command(kind):
+  """Recompute every venue's and artist's neighbours; also done in the background every SIMILAR_REBUILD_SECONDS."""
+  for name in kind or MODELS:
+    started = time.perf_counter()
+    kept = recommendations.rebuild(name)
+    if kept is None:
+      click.echo(f'Similar {name}s were rebuilt meanwhile by another process')
+    else:
+      click.echo(f'Kept {kept} similar {name}s in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#----------------------------------------------------------------------------#
+# With DATABASE_REPLICA_URLS set, every replica becomes a bind ('replica_0',
+# ...). GET requests and the search POSTs read from one of them; writes, and
+# every request of a user for REPLICA_STICKY_SECONDS after they committed
+# something, stay on the primary so they read their own writes.
+
+# POST endpoints that only read
+READ_ONLY_POSTS = {'search_venues', 'search_artists', 'search_shows'}
+
+PRIMARY_UNTIL_KEY = 'primary_until'
+
+
+def reading_own_writes():
+  """Whether the current request is in its user's primary window after a write.
+
+  Such requests skip the view cache: a replica-routed request of another
+  user may have refilled it with data older than the write.
+  """
+  return has_request_context() and g.get('db_route') == 'sticky'
+
+
+def replica_bind():
+  """The replica bind the current request reads from, or None for the primary."""
+  return g.get('db_bind') if has_request_context() else None
+
+
+class RoutingSession(Session):
+  """db.session sending the reads of replica-routed requests to that request's replica.
+
+  Flushes, and anything outside such a request (CLI commands, background
+  threads), use the primary.
+  """
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is None and not self._flushing and has_request_context():
+      replica = g.get('db_replica')
+      if replica is not None:
+        return replica
+    return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def remember_write(db_session):
+  if has_request_context():
+    g.db_wrote = True
+
+
+class ReplicaRouter:
+  """Picks the primary or a replica for each request and counts the decisions."""
+
+  def __init__(self):
+    self.replicas = ()
+    self.sticky_seconds = 5
+    self.routed = {'primary': 0, 'replica': 0, 'sticky': 0}
+    self._lock = threading.Lock()
+
+  def init_app(self, app, db):
+    """Register the replica binds, with the primary's engine options; call before db.init_app(app)."""
+    urls = app.config.get('REPLICA_URLS', [])
+    self.replicas = tuple(f'replica_{index}' for index in range(len(urls)))
+    self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for bind, url in zip(self.replicas, urls):
+      binds[bind] = dict(options, url=url)
+    app.extensions['replica_router'] = self
+    if not self.replicas:
+      return
+
+    @app.before_request
+    def route_request():
+      if request.endpoint == 'static':
+        return
+      route, bind = self.route()
+      g.db_route = route
+      if bind is not None:
+        g.db_bind = bind
+        g.db_replica = db.engines[bind]
+      with self._lock:
+        self.routed[route] += 1
+      app.logger.debug('db route %s %s (%s) -> %s', request.method, request.path, route, bind or 'primary')
+
+    @app.after_request
+    def stick_to_primary(response):
+      if g.get('db_wrote'):
+        session[PRIMARY_UNTIL_KEY] = time.time() + self.sticky_seconds
+      return response
+
+  def route(self):
+    """(reason, replica bind key or None) for the current request."""
+    if request.method not in ('GET', 'HEAD') and request.endpoint not in READ_ONLY_POSTS:
+      return 'primary', None
+    if session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+      return 'sticky', None
+    return 'replica', random.choice(self.replicas)
+
+  def stats(self):
+    with self._lock:
+      return {"replicas": list(self.replicas), "routed": dict(self.routed)}
+
+
+router = ReplicaRouter()
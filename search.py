@@ -0,0 +1,111 @@
+from sqlalchemy import func, or_
+from enums import Genre
+from genres import any_genre
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+# Venues and artists carry a `search_vector` (name, genres, city and state)
+# kept current by a database trigger. A term matches on that vector, on
+# trigram similarity of the name (typos) or on a plain substring of the name,
+# and results are ranked by full-text rank plus name similarity.
+
+SEARCH_CONFIG = 'simple'
+
+def matching_genres(search_term):
+  """Genre names (as stored) that the term spells, by name or label: 'hip-hop' -> ['HipHop']."""
+  term = search_term.strip().lower()
+  return [genre.name for genre in Genre if term in (genre.name.lower(), genre.value.lower())]
+
+
+def match_and_rank(model, search_term):
+  """(filter, rank) expressions of `model` for `search_term`."""
+  query = func.websearch_to_tsquery(SEARCH_CONFIG, search_term)
+  criteria = [
+    model.search_vector.op('@@')(query),
+    model.name.op('%')(search_term),
+    model.name.ilike('%' + search_term + '%'),
+  ]
+  genres = matching_genres(search_term)
+  if genres:
+    criteria.append(any_genre(model.genres, genres))
+  rank = func.ts_rank_cd(model.search_vector, query) + func.similarity(model.name, search_term)
+  return or_(*criteria), rank
+
+
+def page_bounds(page, per_page):
+  page = max(page, 1)
+  return page, (page - 1) * per_page
+
+
+def search_entities(model, search_term, page=1, per_page=20):
+  """One relevance-ordered page of venues or artists with their upcoming show counts.
+
+  Matches, ranks, the total match count (a window function) and the upcoming
+  show counters all come from a single statement.
+  """
+  page, offset = page_bounds(page, per_page)
+  criteria, rank = match_and_rank(model, search_term)
+
+  rows = db.session.query(
+    model.id,
+    model.name,
+    model.city,
+    model.state,
+    model.upcoming_shows_count.label('num_upcoming_shows'),
+    func.count().over().label('total')
+  ).filter(
+    criteria
+  ).order_by(
+    rank.desc(), model.name, model.id
+  ).limit(per_page).offset(offset).all()
+
+  total = rows[0].total if rows else 0
+  return {
+    "count": total,
+    "page": page,
+    "pages": -(-total // per_page),
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "city": row.city,
+      "state": row.state,
+      "num_upcoming_shows": row.num_upcoming_shows
+    } for row in rows]
+  }
+
+
+def search_shows(search_term, page=1, per_page=20):
+  """One relevance-ordered page of shows whose artist or venue matches the term."""
+  page, offset = page_bounds(page, per_page)
+  artist_criteria, artist_rank = match_and_rank(Artist, search_term)
+  venue_criteria, venue_rank = match_and_rank(Venue, search_term)
+
+  rows = db.session.query(
+    Show.artist_id,
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'),
+    Show.venue_id,
+    Venue.name.label('venue_name'),
+    Show.start_time,
+    func.count().over().label('total')
+  ).join(
+    Artist, Artist.id == Show.artist_id
+  ).join(
+    Venue, Venue.id == Show.venue_id
+  ).filter(
+    or_(artist_criteria, venue_criteria)
+  ).order_by(
+    func.greatest(artist_rank, venue_rank).desc(), Show.start_time, Show.id
+  ).limit(per_page).offset(offset).all()
+
+  total = rows[0].total if rows else 0
+  return {
+    "count": total,
+    "page": page,
+    "pages": -(-total // per_page),
+    "data": [{
+      key: value for key, value in row._mapping.items() if key != 'total'
+    } for row in rows]
+  }
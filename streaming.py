@@ -0,0 +1,36 @@
+from flask import current_app, stream_with_context
+
+#----------------------------------------------------------------------------#
+# Streamed pages.
+#----------------------------------------------------------------------------#
+
+# Placed by layouts/main.html just before the content block: everything up to
+# it (head, navigation, flashed messages) goes out before the page's rows are
+# queried.
+FLUSH_MARK = '<!-- flush -->'
+
+
+def stream_page(template_name, **context):
+  """Response rendering `template_name` while it is sent, in chunks of STREAM_CHUNK_SIZE characters.
+
+  Pass generators (e.g. over server-side cursors) for the row collections so
+  neither the rows nor the HTML are held in memory whole. The request
+  context, and with it db.session, stays open until the last chunk.
+  """
+  app = current_app._get_current_object()
+  template = app.jinja_env.get_or_select_template(template_name)
+  app.update_template_context(context)
+  chunk_size = app.config.get('STREAM_CHUNK_SIZE', 16384)
+
+  def generate():
+    buffer, size = [], 0
+    for piece in template.generate(context):
+      buffer.append(piece)
+      size += len(piece)
+      if size >= chunk_size or FLUSH_MARK in piece:
+        yield ''.join(buffer)
+        buffer, size = [], 0
+    if buffer:
+      yield ''.join(buffer)
+
+  return app.response_class(stream_with_context(generate()), mimetype='text/html')
@@ -0,0 +1,197 @@
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import or_
+from background import run_in_background
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Prefix index.
+#----------------------------------------------------------------------------#
+
+SUGGEST_MODELS = {
+  'venue': Venue,
+  'artist': Artist,
+}
+
+# Sorts after any character a folded name can contain, closing a prefix range
+PREFIX_END = '\U0010ffff'
+
+
+def fold(text):
+  return ' '.join(text.casefold().split())
+
+
+def name_keys(name):
+  """Every word-start suffix of the folded name, so 'hop' finds 'The Musical Hop'."""
+  words = fold(name).split(' ')
+  return [' '.join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+class PrefixIndex:
+  """Names in one sorted list of (folded key, kind, id, name); a prefix is a bisect range."""
+
+  def __init__(self, entries=()):
+    self._entries = sorted(
+      (key, kind, entity_id, name) for kind, entity_id, name in entries for key in name_keys(name)
+    )
+    self._names = {(kind, entity_id): name for _, kind, entity_id, name in self._entries}
+
+  def add(self, kind, entity_id, name):
+    self.remove(kind, entity_id)
+    for key in name_keys(name):
+      insort(self._entries, (key, kind, entity_id, name))
+    self._names[(kind, entity_id)] = name
+
+  def remove(self, kind, entity_id):
+    name = self._names.pop((kind, entity_id), None)
+    if name is None:
+      return
+    for key in name_keys(name):
+      position = bisect_left(self._entries, (key, kind, entity_id, name))
+      if position < len(self._entries) and self._entries[position][1:3] == (kind, entity_id):
+        del self._entries[position]
+
+  def search(self, prefix, limit):
+    """Up to `limit` distinct (kind, id, name) whose name has a word starting with `prefix`."""
+    prefix = fold(prefix)
+    start = bisect_left(self._entries, (prefix,))
+    end = bisect_left(self._entries, (prefix + PREFIX_END,), start)
+    found = {}
+    for position in range(start, end):
+      _, kind, entity_id, name = self._entries[position]
+      found.setdefault((kind, entity_id), name)
+      if len(found) == limit:
+        break
+    return [(kind, entity_id, name) for (kind, entity_id), name in found.items()]
+
+  def memory(self):
+    """Approximate bytes held by the list, its tuples and their strings."""
+    seen = set()
+    total = sys.getsizeof(self._entries) + sys.getsizeof(self._names)
+    for entry in self._entries:
+      total += sys.getsizeof(entry)
+      for value in entry:
+        if id(value) not in seen:
+          seen.add(id(value))
+          total += sys.getsizeof(value)
+    return total
+
+  def __len__(self):
+    return len(self._names)
+
+#----------------------------------------------------------------------------#
+# Suggestions.
+#----------------------------------------------------------------------------#
+
+class Suggestions:
+  """Venue and artist name typeahead answered from a per-process PrefixIndex.
+
+  The index is built in a background thread once the process serves its
+  first request, and rebuilt every SUGGEST_REBUILD_SECONDS, which also picks
+  up writes made by other processes. The write handlers keep it current in
+  between. Until the first build
+  finishes (or when SUGGEST_INDEX is off) lookups go to the database instead.
+  """
+
+  def __init__(self):
+    self.index = None
+    self.built_at = None
+    self.build_seconds = None
+    self.build_bytes = None
+    self._pending = None
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    app.extensions['suggestions'] = self
+    if not app.config.get('SUGGEST_INDEX', True):
+      return
+    interval = app.config.get('SUGGEST_REBUILD_SECONDS', 300)
+
+    def run():
+      while True:
+        try:
+          with app.app_context():
+            self.rebuild()
+          app.logger.info('suggest index: %(names)d names, %(bytes)d bytes, built in %(build_seconds).3fs', self.stats())
+        except Exception:
+          app.logger.exception('suggest index build failed; serving suggestions from the database')
+        if not interval:
+          break
+        time.sleep(interval)
+
+    run_in_background(app, 'suggest-index', run)
+
+  def rebuild(self):
+    started = time.perf_counter()
+    with self._lock:
+      # writes landing while the names are read are replayed on the new index
+      self._pending = []
+    entries = []
+    for kind, model in SUGGEST_MODELS.items():
+      rows = db.session.query(model.id, model.name).execution_options(yield_per=5000)
+      entries.extend((kind, row.id, row.name) for row in rows)
+    index = PrefixIndex(entries)
+    build_bytes = index.memory()
+    with self._lock:
+      for operation, args in self._pending:
+        getattr(index, operation)(*args)
+      self._pending = None
+      self.index = index
+      self.built_at = time.time()
+      self.build_seconds = time.perf_counter() - started
+      self.build_bytes = build_bytes
+
+  def _apply(self, operation, *args):
+    with self._lock:
+      if self._pending is not None:
+        self._pending.append((operation, args))
+      if self.index is not None:
+        getattr(self.index, operation)(*args)
+
+  def add(self, kind, entity_id, name):
+    """Record a created or renamed venue / artist."""
+    self._apply('add', kind, entity_id, name)
+
+  def remove(self, kind, entity_id):
+    self._apply('remove', kind, entity_id)
+
+  def suggest(self, prefix, limit=10):
+    """Names starting a word with `prefix`, as dicts of kind, id and name."""
+    if not prefix.strip():
+      return []
+    with self._lock:
+      index = self.index
+      matches = index.search(prefix, limit) if index is not None else None
+    if matches is None:
+      matches = database_suggestions(prefix, limit)
+    return [{"kind": kind, "id": entity_id, "name": name} for kind, entity_id, name in matches]
+
+  def stats(self):
+    with self._lock:
+      index = self.index
+      return {
+        "ready": index is not None,
+        "names": len(index) if index is not None else 0,
+        # measured when the index was built
+        "bytes": self.build_bytes or 0,
+        "built_at": self.built_at,
+        "build_seconds": self.build_seconds
+      }
+
+
+def database_suggestions(prefix, limit):
+  """Cold-index fallback with the same word-start matching, served by the trigram name indexes."""
+  prefix = ' '.join(prefix.split()).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+  matches = []
+  for kind, model in SUGGEST_MODELS.items():
+    rows = db.session.query(model.id, model.name).filter(
+      or_(model.name.ilike(prefix + '%'), model.name.ilike('% ' + prefix + '%'))
+    ).order_by(model.name, model.id).limit(limit)
+    matches.extend((kind, row.id, row.name) for row in rows)
+  matches.sort(key=lambda match: fold(match[2]))
+  return matches[:limit]
+
+
+suggestions = Suggestions()
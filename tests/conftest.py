@@ -0,0 +1,27 @@
+import os
+import pytest
+from app import create_app
+from models import db
+
+
+@pytest.fixture(scope='session')
+def app():
+  """The application, configured once per session (a process holds one application)."""
+  return create_app({
+    'TESTING': True,
+    'CACHE_BACKEND': 'null',
+    'SUGGEST_INDEX': False,
+    'MATCH_REFRESH': False,
+    'SIMILAR_REBUILD': False,
+    'COUNTERS_ROLLOVER_SECONDS': 0,
+  })
+
+
+@pytest.fixture
+def database(app):
+  """The session of an app context over the DATABASE_URL database; skips without one."""
+  if not os.environ.get('DATABASE_URL'):
+    pytest.skip('DATABASE_URL is not set')
+  with app.app_context():
+    yield db
+    db.session.rollback()
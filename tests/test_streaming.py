@@ -0,0 +1,55 @@
+import tracemalloc
+import pytest
+from sqlalchemy import delete, insert
+from models import Venue, Artist
+
+
+def add_rows(db, model, count, start=0):
+  """Insert `count` venues or artists, 50 to a test city; returns their ids.
+
+  venue_areas holds one area's venues at a time, so the areas stay small.
+  """
+  rows = [
+    {
+      'name': f'Test {model.__name__} {index}', 'city': f'Test City {index // 50}', 'state': 'ZZ', 'phone': '123-456-7890',
+      'genres': ['Jazz'], 'image_link': '', 'facebook_link': '', 'website': '', 'seeking_description': '',
+      **({'address': '1 Test Street'} if model is Venue else {})
+    }
+    for index in range(start, start + count)
+  ]
+  ids = db.session.execute(insert(model).returning(model.id), rows).scalars().all()
+  db.session.commit()
+  return ids
+
+
+def streamed_peak(client, path):
+  """(bytes sent, peak traced memory) of requesting `path` and reading the streamed body."""
+  tracemalloc.start()
+  try:
+    response = client.get(path, buffered=False)
+    assert response.status_code == 200
+    sent = sum(len(chunk) for chunk in response.response)
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return sent, peak
+
+
+@pytest.mark.parametrize('model, path', [(Venue, '/venues'), (Artist, '/artists')])
+def test_listing_peak_memory_stays_flat(app, database, model, path):
+  client = app.test_client()
+  ids = []
+  try:
+    # the first request compiles and caches the templates
+    streamed_peak(client, path)
+    ids += add_rows(database, model, 2000)
+    small_sent, small_peak = streamed_peak(client, path)
+    ids += add_rows(database, model, 18000, start=len(ids))
+    large_sent, large_peak = streamed_peak(client, path)
+    assert large_sent > 5 * small_sent
+    assert large_peak < 1.5 * small_peak
+  finally:
+    database.session.rollback()
+    database.session.execute(delete(model).where(model.id.in_(ids)))
+    database.session.commit()
@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from sqlalchemy import delete, event
+from models import Venue
+from queries import venue_areas
+
+
+def add_venues(db, count, start=0):
+  """Flush `count` venues spread over a handful of test areas; returns their ids."""
+  venues = [
+    Venue(
+      name=f'Test Venue {index}', city=f'Test City {index % 7}', state='ZZ', address='1 Test Street',
+      phone='123-456-7890', image_link='', facebook_link='', website='', genres=['Jazz'],
+      seeking_description=''
+    )
+    for index in range(start, start + count)
+  ]
+  db.session.add_all(venues)
+  db.session.flush()
+  return [venue.id for venue in venues]
+
+
+@contextmanager
+def statements(db):
+  """Collect the SQL statements sent through any of the app's engines."""
+  sent = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    sent.append(statement)
+
+  engines = list(db.engines.values())
+  for engine in engines:
+    event.listen(engine, 'before_cursor_execute', record)
+  try:
+    yield sent
+  finally:
+    for engine in engines:
+      event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_venue_areas_is_one_statement(database):
+  for count in (5, 500):
+    ids = add_venues(database, count)
+    with statements(database) as sent:
+      areas = [area for area in venue_areas() if area['state'] == 'ZZ']
+    assert len(sent) == 1
+    listed = {venue['id'] for area in areas for venue in area['venues']}
+    assert set(ids) <= listed
+
+
+def test_venues_page_statement_count_is_fixed(app, database):
+  client = app.test_client()
+  ids = []
+  try:
+    counts = []
+    for count in (5, 500):
+      ids += add_venues(database, count, start=len(ids))
+      database.session.commit()
+      with statements(database) as sent:
+        response = client.get('/venues')
+        response.get_data()
+      assert response.status_code == 200
+      counts.append(len(sent))
+    assert counts[0] == counts[1]
+  finally:
+    database.session.rollback()
+    database.session.execute(delete(Venue).where(Venue.id.in_(ids)))
+    database.session.commit()
@@ -0,0 +1,16 @@
+#----------------------------------------------------------------------------#
+# Production entry point.
+#----------------------------------------------------------------------------#
+# gunicorn 'wsgi:application' --workers 4
+# uwsgi --module wsgi:application --processes 4 --lazy-apps
+#
+# Each worker opens its own connection pool (DB_POOL_SIZE + DB_MAX_OVERFLOW
+# connections at most) and starts its own background threads (suggest index,
+# matches, recommendations) with its first request, so the app must be
+# loaded in every worker rather than before the fork (no gunicorn --preload,
+# --lazy-apps for uWSGI).
+# The flask CLI uses it too, without the threads: FLASK_APP=wsgi flask db upgrade
+
+from app import create_app
+
+application = app = create_app()